@@ -0,0 +1,128 @@
+"""Compares img result extraction with the old BeautifulSoup path.
+
+Fixture is a results page in the legacy layout with rg_meta divs, google
+does not serve it anymore, so it is generated by this script:
+
+    python benchmarks/img_extract.py --generate
+    python benchmarks/img_extract.py
+
+Should be run from repository root with bot requirements installed, old
+path is measured only if bs4 is installed.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import base64
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.apis.module_img import extract_images, MAX_RESULTS
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURE = os.path.join(FIXTURES_DIR, 'img_results.html.gz')
+
+RUNS = 20
+
+
+def generate_page(results, seed=0):
+    rnd = random.Random(seed)
+
+    def token(n):
+        return ''.join(rnd.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=n))
+
+    # inline styles and scripts take most of real page
+    parts = [
+        '<!doctype html><html><head><title>query - Google Search</title>',
+        '<style>' + ''.join(f'.{token(6)}{{margin:{rnd.randint(0, 9)}px}}' for _ in range(3000)) + '</style>',
+        '<script>' + ''.join(f'var {token(8)}="{token(40)}";' for _ in range(2000)) + '</script>',
+        '</head><body><div id="rg_s">'
+    ]
+    thumbnail = base64.b64encode(bytes(rnd.getrandbits(8) for _ in range(1500))).decode()
+    for i in range(results):
+        width, height = rnd.randint(200, 2000), rnd.randint(200, 2000)
+        meta = {
+            'id': token(14), 'isu': f'{token(8)}.com', 'itg': 0,
+            'ity': 'svg' if i % 25 == 24 else rnd.choice(('jpg', 'png', 'gif')),
+            'oh': height, 'ou': f'https://{token(8)}.com/images/{token(12)}.jpg', 'ow': width,
+            'pt': f'{token(10)} {token(6)}', 'rh': f'{token(8)}.com', 'rid': token(14),
+            's': token(30), 'th': 180, 'tu': f'https://encrypted-tbn0.gstatic.com/images?q=tbn:{token(40)}', 'tw': 200
+        }
+        parts.append(
+            f'<div class="rg_bx rg_di rg_el ivg-i" data-ri="{i}">'
+            f'<a class="rg_l" href="/imgres?imgurl={meta["ou"]}">'
+            f'<img class="rg_ic rg_i" alt="" src="data:image/jpeg;base64,{thumbnail}"></a>'
+            f'<div class="rg_meta notranslate">{json.dumps(meta)}</div></div>'
+        )
+    parts.append('</div></body></html>')
+
+    return ''.join(parts).encode()
+
+
+def extract_images_bs4(page):
+    # old implementation
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page, 'lxml')
+    metas = [json.loads(e.text) for e in soup.find_all('div', class_='rg_meta')]
+
+    return [m['ou'] for m in metas if m['ity'] != 'svg']
+
+
+def measure(fn, page):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        result = fn(page)
+    elapsed = (time.perf_counter() - start) / RUNS
+
+    tracemalloc.start()
+    fn(page)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main():
+    if '--generate' in sys.argv:
+        os.makedirs(FIXTURES_DIR, exist_ok=True)
+        with gzip.open(FIXTURE, 'wb') as f:
+            f.write(generate_page(100))
+
+        return
+
+    with gzip.open(FIXTURE) as f:
+        page = f.read()
+
+    pages = [
+        ('fixture, 100 results', page),
+        ('generated, 20 results', generate_page(20, seed=1)),
+        ('generated, 400 results', generate_page(400, seed=2)),
+    ]
+
+    try:
+        import bs4
+    except ImportError:
+        bs4 = None
+        print('bs4 is not installed, old path is skipped')
+
+    # peak is python heap only, libxml2 allocations are not counted
+    for name, page in pages:
+        urls, elapsed, peak = measure(extract_images, page)
+        line = f'{name} ({len(page) / 2 ** 20:.2f}MB): lxml target {elapsed * 1000:.1f}ms, peak {peak / 2 ** 20:.2f}MB'
+
+        if bs4 is not None:
+            old_urls, old_elapsed, old_peak = measure(extract_images_bs4, page)
+            assert urls == old_urls[:MAX_RESULTS]
+            line += f'; bs4 {old_elapsed * 1000:.1f}ms, peak {old_peak / 2 ** 20:.2f}MB'
+
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
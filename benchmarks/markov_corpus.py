@@ -0,0 +1,124 @@
+"""Compares MarkovModel with the old dict of word lists on synthetic
+corpus of 100k messages (zipf distributed words from 20k vocabulary).
+
+    python benchmarks/markov_corpus.py [--memory]
+
+Memory is measured with tracemalloc only if --memory is passed, it slows
+building down.
+"""
+
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.markov as markov
+
+
+MESSAGES = 100000
+VOCABULARY = 20000
+GENERATE_RUNS = 100
+GENERATE_WORDS = 100
+
+
+def make_corpus(seed=1):
+    rnd = random.Random(seed)
+    vocabulary = [f'w{i}' for i in range(VOCABULARY)]
+    weights = [1 / (i + 1) for i in range(VOCABULARY)]
+
+    return [
+        ' '.join(rnd.choices(vocabulary, weights, k=rnd.randint(3, 15)))
+        for _ in range(MESSAGES)
+    ]
+
+
+def build_old(messages):
+    # old implementation, rebuilt from history on every call
+    words = [i for s in [m.split(' ') for m in messages] for i in s]
+    word_dict = {}
+    for word, next_word in zip(words, words[1:]):
+        word_dict.setdefault(word.lower(), []).append(next_word)
+
+    return words, word_dict
+
+
+def generate_old(words, word_dict, num_words):
+    chain = [random.choice(words)]
+    for _ in range(num_words):
+        word = chain[-1]
+        if word in word_dict:
+            next_word = random.choice(word_dict[word])
+        else:
+            next_word = random.choice(random.choice(tuple(word_dict.values())))
+        chain.append(next_word)
+
+    max(word_dict, key=lambda x: len(word_dict[x]))
+
+    return chain
+
+
+def build_new(messages, order):
+    model = markov.MarkovModel(order)
+    for text in messages:
+        model.add_message(text)
+
+    return model
+
+
+def generate_new(model, num_words):
+    model.most_frequent_word()
+
+    return model.generate(num_words)
+
+
+def measure(build, generate, track_memory):
+    if track_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    built = build()
+    build_time = time.perf_counter() - start
+
+    memory = None
+    if track_memory:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(GENERATE_RUNS):
+        generate(built)
+    generate_time = (time.perf_counter() - start) / GENERATE_RUNS
+
+    line = f'build {build_time:.2f}s, generate {GENERATE_WORDS} words {generate_time * 1000:.2f}ms'
+    if memory is not None:
+        line += f', {memory / 2 ** 20:.1f}MB'
+
+    return built, line
+
+
+def main():
+    track_memory = '--memory' in sys.argv
+    messages = make_corpus()
+
+    _, line = measure(
+        lambda: build_old(messages),
+        lambda built: generate_old(*built, GENERATE_WORDS), track_memory)
+    print(f'dict of lists: {line}')
+
+    max_transitions = markov.MAX_TRANSITIONS
+    for order in (1, 2):
+        for capped in (True, False):
+            markov.MAX_TRANSITIONS = max_transitions if capped else float('inf')
+            model, line = measure(
+                lambda: build_new(messages, order),
+                lambda model: generate_new(model, GENERATE_WORDS), track_memory)
+            print(f'order {order}, {"capped" if capped else "uncapped"}: {line}, {model._size} transitions')
+
+    markov.MAX_TRANSITIONS = max_transitions
+
+
+if __name__ == '__main__':
+    main()
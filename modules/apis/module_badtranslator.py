@@ -1,5 +1,6 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
+from objects.lazyimport import lazy_import
 
 import asyncio
 import random
@@ -7,20 +8,12 @@ import random
 from discord import Embed, Colour
 
 try:
-    import aiogoogletrans as gt
+    gt = lazy_import('aiogoogletrans')
 except ImportError:
-	raise ImportError(
+    raise ImportError(
         'aiogoogletrans python library is required to use module'
         'You can install it at https://github.com/Fogapod/aiogoogletrans'
-)
-
-translate_urls = [
-    'translate.google.com', 'translate.google.co.kr',
-    'translate.google.at', 'translate.google.de',
-    'translate.google.ru', 'translate.google.ch',
-    'translate.google.fr', 'translate.google.es'
-]
-
+    )
 
 DEFAULT_CHAIN_LEN = 5
 MAX_CHAIN_LEN = 7  # 10 for patrons?
@@ -54,9 +47,6 @@ class Module(ModuleBase):
     }
     ratelimit = (1, 5)
 
-    async def on_load(self, from_reload):
-        self.translator = gt.Translator(service_urls=translate_urls)
-
     async def on_call(self, ctx, args, **flags):
         if args[1:].lower() == 'list':
             return '\n'.join(f'`{k}`: {v}' for k, v in gt.LANGUAGES.items())
@@ -86,10 +76,8 @@ class Module(ModuleBase):
             text = args[1:]
             try:
                 for l in langs:
-                    translation = await self.translator.translate(
-                        text, dest=l,
-                        proxy=self.bot.get_proxy(allow_none=True)
-                    )
+                    translation = await self.bot.translator.translate(
+                        text, l, provider='google')
                     text = translation.text
             except Exception:
                 return await ctx.error(
@@ -106,6 +94,3 @@ class Module(ModuleBase):
             e.set_footer(text=ctx.author, icon_url=ctx.author.avatar_url)
 
             await ctx.send(embed=e)
-
-        async def on_unload(self):
-            await self.translator.close()
@@ -6,8 +6,6 @@ import random
 from discord import Embed, Colour
 
 
-API_URL = 'https://translate.yandex.net/api/v1.5/tr.json/'
-
 DEFAULT_CHAIN_LEN = 5
 MAX_CHAIN_LEN = 7  # 10 for patrons?
 
@@ -40,19 +38,7 @@ class Module(ModuleBase):
     }
 
     async def on_load(self, from_reload):
-        self.api_key = self.bot.config.get('yandex_api_key')
-        if self.api_key:
-            params = {
-                'key': self.api_key,
-                'ui': 'en'
-            }
-
-            async with self.bot.sess.get(API_URL + 'getLangs', params=params) as r:
-                if r.status == 200:
-                    self.langs = (await r.json())['langs']
-                    return
-
-        raise Exception('No yandex api key in config or key is invalid')
+        self.langs = await self.bot.translator.get_languages('yandex')
 
     async def on_call(self, ctx, args, **flags):
         if args[1:].lower() == 'list':
@@ -84,16 +70,9 @@ class Module(ModuleBase):
 
             try:
                 for i, l in enumerate(langs):
-                    params = {
-                        'key': self.api_key,
-                        'text': text,
-                        'lang': f'{langs[i - 1] + "-" if i else ""}{l}'
-                    }
-                    async with self.bot.sess.post(API_URL + 'translate', params=params) as r:
-                        if r.status != 200:
-                            return await ctx.error('Failed to translate. Please, try again later')
-
-                        text = (await r.json())['text'][0]
+                    translation = await self.bot.translator.translate(
+                        text, l, src=langs[i - 1] if i else None)
+                    text = translation.text
             except Exception:
                 return await ctx.error('Failed to translate. Please, try again later')
 
@@ -4,8 +4,6 @@ from objects.paginators import Paginator
 
 from discord import Embed, Colour
 
-import aiohttp
-
 API_URL = 'https://api.duckduckgo.com'
 
 class Module(ModuleBase):
@@ -26,13 +24,13 @@ class Module(ModuleBase):
             'no_html': 1
         }
 
-        async with self.bot.sess.get(API_URL, params=params) as r:
-            if r.status != 200:
-                return await ctx.error(f'Rquest failed: {r.status}')
-            try:
-                r_json = await r.json(content_type='application/x-javascript')
-            except aiohttp.ContentTypeError:  # (text/html; charset=utf-8) with query "osu!", ???
-                return await ctx.error('Failed to read response')
+        r = await self.bot.services.get('duckduckgo').get(API_URL, params=params)
+        if r.status != 200:
+            return await ctx.error(f'Rquest failed: {r.status}')
+        try:
+            r_json = r.json()
+        except ValueError:  # (text/html; charset=utf-8) with query "osu!", ???
+            return await ctx.error('Failed to read response')
 
         def make_embed(page):
             e = Embed(colour=Colour.gold(), title='DuckDuckGo')
@@ -1,25 +1,18 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
+from objects.lazyimport import lazy_import
 
 from discord import Embed, Colour
 
 
 try:
-    import aiogoogletrans as gt
+    gt = lazy_import('aiogoogletrans')
 except ImportError:
-	raise ImportError(
+    raise ImportError(
         'aiogoogletrans python library is required to use module'
         'You can install it at https://github.com/Fogapod/aiogoogletrans'
     )
 
-
-translate_urls = [
-    'translate.google.com', 'translate.google.co.kr',
-    'translate.google.at', 'translate.google.de',
-    'translate.google.ru', 'translate.google.ch',
-    'translate.google.fr', 'translate.google.es'
-]
-
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <text>'
@@ -48,9 +41,6 @@ class Module(ModuleBase):
         }
     }
 
-    async def on_load(self, from_reload):
-        self.translator = gt.Translator(service_urls=translate_urls)
-
     async def on_call(self, ctx, args, **flags):
         if args[1:].lower() == 'list':
             return '\n'.join(f'`{k}`: {v}' for k, v in gt.LANGUAGES.items())
@@ -64,10 +54,8 @@ class Module(ModuleBase):
             return await ctx.warn('Invalid out language. Try using list subcommand')
 
         try:
-            translation = await self.translator.translate(
-                args[1:], src=in_lang or 'auto', dest=out_lang,
-                proxy=self.bot.get_proxy(allow_none=True)
-            )
+            translation = await self.bot.translator.translate(
+                args[1:], out_lang, src=in_lang, provider='google')
         except Exception:
             return await ctx.error(
                 'Failed to translate. Please, try again later.\n'
@@ -83,6 +71,3 @@ class Module(ModuleBase):
         e.set_footer(text=ctx.author, icon_url=ctx.author.avatar_url)
 
         await ctx.send(embed=e)
-
-    async def on_unload(self):
-        await self.translator.close()
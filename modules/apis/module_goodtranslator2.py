@@ -4,8 +4,6 @@ from objects.permissions import PermissionEmbedLinks
 from discord import Embed, Colour
 
 
-API_URL = 'https://translate.yandex.net/api/v1.5/tr.json/'
-
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <text>'
@@ -35,19 +33,7 @@ class Module(ModuleBase):
     }
 
     async def on_load(self, from_reload):
-        self.api_key = self.bot.config.get('yandex_api_key')
-        if self.api_key:
-            params = {
-                'key': self.api_key,
-                'ui': 'en'
-            }
-
-            async with self.bot.sess.get(API_URL + 'getLangs', params=params) as r:
-                if r.status == 200:
-                    self.langs = (await r.json())['langs']
-                    return
-
-        raise Exception('No yandex api key in config or key is invalid')
+        self.langs = await self.bot.translator.get_languages('yandex')
 
     async def on_call(self, ctx, args, **flags):
         if args[1:].lower() == 'list':
@@ -61,19 +47,11 @@ class Module(ModuleBase):
         if out_lang not in self.langs:
             return await ctx.warn('Invalid out language. Try using list subcommand')
 
-        params = {
-            'key': self.api_key,
-            'text': args[1:],
-            'lang': out_lang if in_lang is None else f'{in_lang}-{out_lang}'
-        }
-
         try:
-            async with self.bot.sess.post(API_URL + 'translate', params=params) as r:
-                if r.status != 200:
-                    return await ctx.error('Failed to translate. Please, try again later')
-                r_json = await r.json()
-                text = r_json['text'][0]
-                source, destination = r_json['lang'].split('-')
+            translation = await self.bot.translator.translate(
+                args[1:], out_lang, src=in_lang)
+            text = translation.text
+            source, destination = translation.src, translation.dest
         except Exception:
             return await ctx.error('Failed to translate. Please, try again later')
 
@@ -1,18 +1,30 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
 from objects.paginators import Paginator
+from objects.lazyimport import lazy_import
+from objects.resultcache import ResultCache
 
 from discord import Embed, Colour
 
 import aiohttp
+import asyncio
 import random
 import json
+import time
 
-from bs4 import BeautifulSoup
+etree = lazy_import('lxml.etree')
 
 
 BASE_URL = 'https://www.google.com/search?'
 
+# parsing stops after this number of results
+MAX_RESULTS = 100
+# size of chunks page is fed to parser with
+CHUNK_SIZE = 16 * 1024
+
+CACHE_SIZE = 256
+CACHE_TTL = 600
+
 USERAGENTS = (
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.113 Safari/537.36',
     'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.90 Safari/537.36',
@@ -25,6 +37,74 @@ USERAGENTS = (
     'Mozilla/5.0 (Windows NT 10.0; WOW64; rv:45.0) Gecko/20100101 Firefox/45.0'
 )
 
+class StopParsing(Exception):
+    pass
+
+
+class SearchError(Exception):
+    pass
+
+
+class MetaExtractor:
+    """lxml parser target collecting image urls from rg_meta divs"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.images = []
+
+        self._depth = 0
+        self._text = None
+
+    def start(self, tag, attrib):
+        if self._text is not None:
+            self._depth += 1
+        elif tag == 'div' and 'rg_meta' in attrib.get('class', '').split():
+            self._text = []
+            self._depth = 1
+
+    def data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def end(self, tag):
+        if self._text is None:
+            return
+
+        self._depth -= 1
+        if self._depth:
+            return
+
+        try:
+            meta = json.loads(''.join(self._text))
+        except ValueError:
+            meta = {}
+        finally:
+            self._text = None
+
+        if 'ou' in meta and meta.get('ity') != 'svg':
+            self.images.append(meta['ou'])
+            if len(self.images) >= self.limit:
+                raise StopParsing
+
+    def close(self):
+        return self.images
+
+
+def extract_images(page, limit=MAX_RESULTS):
+    """Returns image urls from google search page, stops after limit results"""
+
+    extractor = MetaExtractor(limit)
+    parser = etree.HTMLParser(target=extractor)
+
+    try:
+        for i in range(0, len(page), CHUNK_SIZE):
+            parser.feed(page[i:i + CHUNK_SIZE])
+
+        return parser.close()
+    except StopParsing:
+        return extractor.images
+
+
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <query>'
@@ -37,29 +117,16 @@ class Module(ModuleBase):
     min_args = 1
     ratelimit = (1, 5)
 
+    async def on_load(self, from_reload):
+        # (query, nsfw): images
+        self._cache = ResultCache(self.bot, CACHE_SIZE, CACHE_TTL)
+
     async def on_call(self, ctx, args, **flags):
         query = args[1:]
 
-        params = {
-            'q': query,
-            'tbm': 'isch',
-            'safe': 'off' if ctx.is_nsfw else 'strict'
-        }
-
-        headers = {'User-Agent': random.choice(USERAGENTS)}
-        proxy = random.choice([None] + list(self.bot.proxies.keys()))
-
-        async with self.bot.sess.get(BASE_URL, params=params, headers=headers, proxy=proxy) as r:
-            if r.status != 200:
-                return await ctx.error(f'Request failed: {r.status}')
-
-            soup = await self.bot.loop.run_in_executor(
-                None, BeautifulSoup, await r.read(), 'lxml')
-
-        elements = soup.find_all('div', class_= 'rg_meta')
-        metas = [json.loads(e.text) for e in elements]
-
-        images = [f'{m["ou"]}' for m in metas if m['ity'] != 'svg']
+        images, error = await self.search(query, ctx.is_nsfw)
+        if error:
+            return await ctx.error(error)
 
         if len(images) == 0:
             return await ctx.warn('No results found')
@@ -79,3 +146,39 @@ class Module(ModuleBase):
             p.add_page(embed=make_embed(i + 1, url))
 
         await p.run(ctx)
+
+    async def search(self, query, nsfw):
+        """Returns (images, error) pair"""
+
+        try:
+            images = await self._cache.get((query.lower(), nsfw), self._search, query, nsfw)
+        except SearchError as e:
+            return None, str(e)
+
+        return images, None
+
+    async def _search(self, query, nsfw):
+        params = {
+            'q': query,
+            'tbm': 'isch',
+            'safe': 'off' if nsfw else 'strict'
+        }
+
+        headers = {'User-Agent': random.choice(USERAGENTS)}
+        proxy = self.bot.get_proxy(allow_none=True)
+
+        # google blocks proxies with 429 and 503 responses, retrying with
+        # the same proxy does not help
+        begin = time.time()
+        try:
+            r = await self.bot.services.get('google_images').get(
+                BASE_URL, params=params, headers=headers, proxy=proxy, retries=0)
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+            self.bot.report_proxy(proxy, False)
+            raise
+
+        self.bot.report_proxy(proxy, r.status == 200, time.time() - begin)
+        if r.status != 200:
+            raise SearchError(f'Request failed: {r.status}')
+
+        return await self.bot.loop.run_in_executor(None, extract_images, r.body)
@@ -3,6 +3,8 @@ from objects.paginators import UpdatingPaginator
 from objects.permissions import PermissionEmbedLinks
 
 
+from objects.services import ServiceUnavailable
+
 from discord import Embed, Colour
 
 
@@ -22,10 +24,15 @@ class Module(ModuleBase):
         await p.run(ctx, self.paginator_update_func)
 
     async def paginator_update_func(self, p):
-        async with self.bot.sess.get(API_URL) as r:
-            if r.status == 200:
-                e = Embed(colour=Colour.gold())
-                e.set_image(url=await r.text())
-                e.set_footer(text='Powered by https://inspirobot.me')
-
-                return { 'embed': e }
\ No newline at end of file
+        try:
+            # every request generates new image
+            r = await self.bot.services.get('inspirobot').get(API_URL, coalesce=False)
+        except ServiceUnavailable:
+            return
+
+        if r.status == 200:
+            e = Embed(colour=Colour.gold())
+            e.set_image(url=r.text())
+            e.set_footer(text='Powered by https://inspirobot.me')
+
+            return { 'embed': e }
\ No newline at end of file
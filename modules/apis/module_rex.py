@@ -1,9 +1,18 @@
 from objects.modulebase import ModuleBase
+from objects.resultcache import ResultCache
 from utils.formatters import cleanup_code
 
+import hashlib
+
 
 API_URL = 'https://rextester.com/rundotnet/api'
 
+# seconds, code execution takes longer than default service timeout
+EXECUTION_TIMEOUT = 60
+
+CACHE_SIZE = 500
+CACHE_TTL = 3600
+
 LANG_CODES = {
     'c#':          1,
     'cs':          1,
@@ -83,6 +92,10 @@ COMPILE_OPTIONS = {
     30: '-ofa.out source_file.d'    # d
 }
 
+class RexError(Exception):
+    pass
+
+
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <language> <program>'
@@ -97,6 +110,9 @@ class Module(ModuleBase):
     category = 'Services'
     min_args = 1
 
+    async def on_load(self, from_reload):
+        self._results = ResultCache(self.bot, CACHE_SIZE, CACHE_TTL)
+
     async def on_call(self, ctx, args, **options):
         result = ''
 
@@ -139,15 +155,27 @@ class Module(ModuleBase):
         params['CompilerArgs'] = COMPILE_OPTIONS.get(params['LanguageChoice'], '')
         params['Program'] = cleaned
 
-        async with self.bot.sess.post(API_URL, params=params) as r:
-            if r.status == 200:
-                result_json = await r.json()
-                result  = result_json['Result'] or ''
-                result += result_json['Errors'] or ''
-            else:
-                return await ctx.error('Error connecting to rextester API. Please, try again later')
+        key = (
+            params['LanguageChoice'],
+            hashlib.sha1(cleaned.encode()).digest(),
+            None  # rextester does not support stdin
+        )
+        try:
+            result = await self._results.get(key, self._execute, params)
+        except RexError as e:
+            return await ctx.error(str(e))
 
         if not result:
             result = 'Empty output'
 
         await ctx.send(f'```\n{result}```')
+
+    async def _execute(self, params):
+        r = await self.bot.services.get('rextester').post(
+            API_URL, params=params, timeout=EXECUTION_TIMEOUT)
+        if r.status != 200:
+            raise RexError('Error connecting to rextester API. Please, try again later')
+
+        result_json = r.json()
+
+        return (result_json['Result'] or '') + (result_json['Errors'] or '')
@@ -1,9 +1,27 @@
 from objects.modulebase import ModuleBase
+from objects.resultcache import ResultCache
+from objects.logger import Logger
 from utils.formatters import cleanup_code
 
+import hashlib
+import traceback
+
 
 API_URL = 'https://run.iomirea.ml/api/v0/languages'
 
+# seconds, code execution takes longer than default service timeout
+EXECUTION_TIMEOUT = 60
+
+CACHE_SIZE = 500
+CACHE_TTL = 3600
+
+logger = Logger.get_logger()
+
+
+class RunError(Exception):
+    pass
+
+
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <language> [program]'
@@ -31,16 +49,30 @@ class Module(ModuleBase):
 
     async def on_load(self, _):
         self.langs = {}
-
-        async with self.bot.sess.get(API_URL) as r:
-            if r.status != 200:
-                return
-            
-            data = await r.json()
-
-        for lang in data:
+        self._results = ResultCache(self.bot, CACHE_SIZE, CACHE_TTL)
+
+        try:
+            await self._update_languages()
+        except Exception:
+            logger.info('Failed to fetch run languages, will retry on call')
+            logger.debug(traceback.format_exc())
+
+    async def _update_languages(self):
+        # table is persisted and refreshed in background by language cache
+        self.langs = await self.bot.language_cache.get(
+            'iomirea_run', self._fetch_languages)
+
+    async def _fetch_languages(self):
+        r = await self.bot.services.get('iomirea_run').get(API_URL)
+        if r.status != 200:
+            raise RunError(f'Failed to fetch languages: {r.status}')
+
+        langs = {}
+        for lang in r.json():
             for alias in lang["aliases"]:
-                self.langs[alias] = lang
+                langs[alias] = lang
+
+        return langs
 
     def _get_language(self, alias):
         alias = alias.lower()
@@ -59,6 +91,11 @@ class Module(ModuleBase):
     async def _on_call(self, ctx, args, **options):
         result = ''
 
+        try:
+            await self._update_languages()
+        except Exception:
+            return await ctx.error('Unable to get list of languages. Please, try again later')
+
         if args[1].lower() == 'list':
             last_name = ""
             for k, v in sorted(self.langs.items(), key=lambda x: x[1]["name"]):
@@ -108,18 +145,28 @@ class Module(ModuleBase):
         if inp is not None:
             payload['input'] = inp.encode("raw_unicode_escape").decode('unicode_escape')
 
-        async with self.bot.sess.post(
-                f'{API_URL}/{language["name"]}', params=dict(merge='1'),
-                json=payload
-        ) as r:
-            if r.status != 200:
-                message = (await r.json())['message']
-                return await ctx.error(
-                    f'Error connecting to IOMirea API. Please, try again later: {message}'
-                )
-
-            data = await r.json()
+        key = (
+            language['name'],
+            hashlib.sha1(cleaned.encode()).digest(),
+            payload.get('input')
+        )
+        try:
+            data = await self._results.get(key, self._execute, language['name'], payload)
+        except RunError as e:
+            return await ctx.error(str(e))
 
         await ctx.send(
             f'```\n{data["stdout"]}\n\nexit code: {data["exit_code"]} | ran for: {round(data["exec_time"], 3)}s```',
         )
+
+    async def _execute(self, language, payload):
+        r = await self.bot.services.get('iomirea_run').post(
+            f'{API_URL}/{language}', params=dict(merge='1'),
+            json=payload, timeout=EXECUTION_TIMEOUT
+        )
+        if r.status != 200:
+            message = r.json()['message']
+            raise RunError(
+                f'Error connecting to IOMirea API. Please, try again later: {message}')
+
+        return r.json()
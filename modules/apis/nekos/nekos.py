@@ -1,6 +1,10 @@
 from objects.bot import KiwiBot
+from objects.services import ServiceUnavailable
 
 import random
+import asyncio
+
+from aiohttp import ClientError
 
 
 API_URL = 'https://nekos.life/api/v2'
@@ -40,9 +44,14 @@ async def neko_api_image_request(tag, **params):
     return await neko_api_request(f'img/{tag}', **params)
 
 async def neko_api_request(endpoint, **params):
-    async with bot.sess.get('/'.join((API_URL, endpoint)), params=params) as r:
-        if r.status == 200:
-            result_json = await r.json()
-            return result_json
-        else:
-            return None
+    try:
+        # images are random, concurrent requests should not share response
+        r = await bot.services.get('nekos').get(
+            '/'.join((API_URL, endpoint)), params=params, coalesce=False)
+    except (ServiceUnavailable, ClientError, asyncio.TimeoutError):
+        return None
+
+    if r.status == 200:
+        return r.json()
+    else:
+        return None
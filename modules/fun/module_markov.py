@@ -1,90 +1,475 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
+from objects.resultcache import ResultCache
+from objects.logger import Logger
 
 from utils.funcs import find_channel
 from utils.formatters import trim_text
+from utils.markov import MarkovModel
 
+import os
+import json
+import zlib
 import random
+import time
+import asyncio
 
-from discord import Embed, Colour
+from collections import OrderedDict
+
+from discord import Embed, Colour, Object, TextChannel
+
+
+# models are saved here to survive restarts, one file per guild
+MARKOV_CACHE_DIR = 'cache/markov'
+# snapshots of guilds without messages for this number of days are deleted
+SNAPSHOT_TTL_DAYS = 30
+# seconds between purges of expired snapshots
+PURGE_INTERVAL = 3600
+
+# guilds with models kept in memory, least recently used are saved and
+# unloaded by save loop
+MAX_GUILDS = 256
+# seconds between saving changed models
+SAVE_INTERVAL = 300
+# messages read to build model for new channel
+BOOTSTRAP_LIMIT = 1000
+# channels accepted in single command
+MAX_CHANNELS = 5
+# most active channels used for server wide model
+MAX_GUILD_CHANNELS = 20
+# number of previous words next word depends on
+ORDER = 1
+
+logger = Logger.get_logger()
 
 
 class Module(ModuleBase):
 
-    usage_doc = '{prefix}{aliases} [channel]'
+    usage_doc = '{prefix}{aliases} [channels...]'
     short_doc = 'Generate text using markov chain'
+    long_doc = (
+        'Command flags:\n'
+        '\t[--guild|-g]: use all channels of this server you can read\n\n'
+        'Messages are learned as they are sent. Learned words are saved on disk '
+        f'and deleted after {SNAPSHOT_TTL_DAYS} days without messages or when '
+        'bot leaves the server'
+    )
 
     name = 'markov'
     aliases = (name, 'markovchain')
     category = 'Actions'
     bot_perms = (PermissionEmbedLinks(), )
     guild_only = True
+    flags = {
+        'guild': {
+            'alias': 'g',
+            'bool': True
+        }
+    }
 
-    async def on_call(self, ctx, args, **flags):
-        if len(args) == 1:
-            channel = ctx.channel
-        else:
-            channel = await find_channel(
-                args[1:], ctx.guild, global_id_search=True,
-                include_voice=False, include_category=False
-            )
-            if channel is None:
-                return await ctx.warn('Channel not found')
+    async def on_load(self, from_reload):
+        self.events = {
+            'message': self.on_message,
+            'guild_join': self.on_guild_join,
+            'guild_remove': self.on_guild_remove
+        }
+
+        # on_load is called again after reconnect, learned models are kept
+        if hasattr(self, 'guilds'):
+            return
+
+        # guild id: {channel id: MarkovModel}
+        self.guilds = OrderedDict()
+        self._dirty = set()
+        # guild id: task
+        self._loading = {}
+        self._saving = {}
+        self._write_lock = asyncio.Lock()
+        # channel id: task
+        self._bootstrapping = {}
+        # guilds bot left, their models are not saved
+        self._removed = set()
+
+        self.order = self.bot.config.get('markov_order', ORDER)
+        self.max_guilds = self.bot.config.get('markov_max_guilds', MAX_GUILDS)
+        self.snapshot_ttl = self.bot.config.get(
+            'markov_snapshot_ttl_days', SNAPSHOT_TTL_DAYS) * 86400
+        self._purged_at = 0
+
+        # merged models of several channels, size is number of transitions
+        self.merged_cache = ResultCache(
+            self.bot, 500000, 60, sizeof=lambda m: m._size)
+
+        os.makedirs(MARKOV_CACHE_DIR, exist_ok=True)
+
+        self._save_task = self.bot.loop.create_task(self._save_loop())
+
+    async def on_unload(self):
+        self._save_task.cancel()
+        await self._save_dirty()
+        await asyncio.gather(*self._saving.values())
+
+    async def on_message(self, msg):
+        if msg.guild is None or not msg.content:
+            return
+
+        models = await self._get_guild(msg.guild.id)
+        model = models.get(msg.channel.id)
+        if model is None:
+            model = models[msg.channel.id] = MarkovModel(self.order)
+            model.first_message_id = msg.id
+
+        model.add_message(msg.content)
+        self._dirty.add(msg.guild.id)
+
+    async def on_guild_join(self, guild):
+        self._removed.discard(guild.id)
+
+    async def on_guild_remove(self, guild):
+        self._removed.add(guild.id)
+
+        # loaded or evicted models could still be written
+        pending = [
+            t for t in (self._loading.get(guild.id), self._saving.get(guild.id))
+            if t is not None
+        ]
+        if pending:
+            await asyncio.wait(pending)
+
+        self.guilds.pop(guild.id, None)
+        self._dirty.discard(guild.id)
 
-            author = channel.guild.get_member(ctx.author.id)
-            if not author or not channel.permissions_for(author).read_messages:
-                return await ctx.error('You don\'t have permission to read messages in that channel')
-            if channel.is_nsfw() > ctx.channel.is_nsfw():
-                return await ctx.warn('Trying to access nsfw channel from sfw channel')
+        async with self._write_lock:
+            await self.bot.loop.run_in_executor(
+                None, self._delete_snapshot, guild.id)
 
-        m = await ctx.send('Generating...')
+    def _snapshot_path(self, guild_id):
+        return os.path.join(MARKOV_CACHE_DIR, str(guild_id))
 
+    def _add_guild(self, guild_id, models):
+        self.guilds[guild_id] = models
+
+        # guilds are evicted by save loop, here only when they pile up
+        # between saves
+        if len(self.guilds) > 2 * self.max_guilds:
+            self._evict()
+
+        return models
+
+    def _evict(self):
+        while len(self.guilds) > self.max_guilds:
+            guild_id, models = self.guilds.popitem(last=False)
+            if guild_id not in self._dirty:
+                continue
+
+            self._dirty.discard(guild_id)
+            task = self._saving[guild_id] = self.bot.loop.create_task(
+                self._save_evicted(guild_id, models))
+            task.add_done_callback(lambda t, i=guild_id: self._saving.pop(i, None))
+
+    async def _get_guild(self, guild_id):
+        """Returns channel models of guild, loaded from disk if needed"""
+
+        models = self.guilds.get(guild_id)
+        if models is not None:
+            self.guilds.move_to_end(guild_id)
+
+            return models
+
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = self._loading[guild_id] = self.bot.loop.create_task(
+                self._load_guild(guild_id))
+
+        # loading is not cancelled with caller, other callers wait for it
+        return await asyncio.shield(task)
+
+    async def _load_guild(self, guild_id):
         try:
-            messages = await channel.history(
-                limit=1000, oldest_first=True,
-                before=ctx.message.edited_at or ctx.message.created_at
-            ).flatten()
-        except Exception:
-            return await self.bot.edit_message(m, 'Failed to read message history')
+            saving = self._saving.get(guild_id)
+            if saving is not None:
+                # snapshot of evicted guild is not written yet
+                await saving
 
-        words = [i for s in [m.content.split(' ') for m in messages if m.content] for i in s]
+            try:
+                models = await self.bot.loop.run_in_executor(
+                    None, self._read_snapshot, guild_id)
+            except Exception as e:
+                logger.info(f'Failed to load markov models for guild {guild_id}: {e}')
+                models = {}
 
-        num_words = min((random.randint(5, 100), len(words)))
-        if num_words < 2:
-            return await self.bot.edit_message(
-                m, 'Not enough words to generate text')
-        
-        pairs = [(words[i].lower(), words[i + 1]) for i in range(len(words) - 1)]
+            return self._add_guild(guild_id, models)
+        finally:
+            del self._loading[guild_id]
 
-        word_dict = {}
+    def _read_snapshot(self, guild_id):
+        try:
+            with open(self._snapshot_path(guild_id), 'rb') as f:
+                snapshot = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return {}
 
-        for word_1, word_2 in pairs:
-            if word_1 in word_dict:
-                word_dict[word_1].append(word_2)
-            else:
-                word_dict[word_1] = [word_2]
+        models = {}
+        for channel_id, data in snapshot.items():
+            model = MarkovModel.from_dict(data, self.order)
+            if model is not None:
+                models[int(channel_id)] = model
+
+        return models
+
+    def _write_snapshot(self, guild_id, snapshots):
+        data = zlib.compress(json.dumps(snapshots, separators=(',', ':')).encode())
+
+        path = self._snapshot_path(guild_id)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def _delete_snapshot(self, guild_id):
+        try:
+            os.remove(self._snapshot_path(guild_id))
+        except FileNotFoundError:
+            pass
+
+    def _purge_expired(self, keep):
+        """Deletes snapshots not written for snapshot_ttl seconds, except
+        guilds in keep"""
+
+        expire_before = time.time() - self.snapshot_ttl
+        purged = 0
+        for entry in os.scandir(MARKOV_CACHE_DIR):
+            if not entry.name.isdigit() or int(entry.name) in keep:
+                continue
+
+            try:
+                if entry.stat().st_mtime < expire_before:
+                    os.remove(entry.path)
+                    purged += 1
+            except FileNotFoundError:
+                pass
+
+        return purged
 
-        chain = [random.choice(words)]
+    def _write_models(self, guild_id, models):
+        self._write_snapshot(
+            guild_id, {str(i): m.to_dict() for i, m in models.items()})
 
-        for i in range(num_words):
-            word = chain[-1]
-            if word in word_dict:
-                next_word = random.choice(word_dict[word])
+    def _drop_deleted_channels(self, guild_id, models):
+        guild = self.bot.get_guild(guild_id)
+        if guild is not None:
+            for channel_id in [i for i in models if guild.get_channel(i) is None]:
+                del models[channel_id]
+
+    async def _save(self, guild_id, models):
+        self._drop_deleted_channels(guild_id, models)
+
+        # models are changed by messages, snapshots are taken on loop
+        snapshots = {}
+        for channel_id, model in list(models.items()):
+            snapshots[str(channel_id)] = model.to_dict()
+            await asyncio.sleep(0)
+
+        try:
+            async with self._write_lock:
+                if guild_id not in self._removed:
+                    await self.bot.loop.run_in_executor(
+                        None, self._write_snapshot, guild_id, snapshots)
+        except Exception as e:
+            logger.info(f'Failed to save markov models for guild {guild_id}: {e}')
+
+    async def _save_evicted(self, guild_id, models):
+        self._drop_deleted_channels(guild_id, models)
+
+        # evicted models are not changed anymore, snapshot is taken in
+        # executor
+        try:
+            async with self._write_lock:
+                if guild_id not in self._removed:
+                    await self.bot.loop.run_in_executor(
+                        None, self._write_models, guild_id, models)
+        except Exception as e:
+            logger.info(f'Failed to save markov models for guild {guild_id}: {e}')
+
+    async def _save_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        for guild_id in dirty:
+            models = self.guilds.get(guild_id)
+            if models is not None:
+                await self._save(guild_id, models)
+
+    async def _purge(self):
+        # loaded guilds are saved again once they get messages
+        keep = {*self.guilds, *self._loading, *self._saving}
+        try:
+            async with self._write_lock:
+                purged = await self.bot.loop.run_in_executor(
+                    None, self._purge_expired, keep)
+        except Exception as e:
+            return logger.info(f'Failed to purge markov snapshots: {e}')
+
+        if purged:
+            logger.info(f'Purged {purged} expired markov snapshots')
+
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(SAVE_INTERVAL)
+            self._evict()
+            await self._save_dirty()
+
+            if time.time() - self._purged_at > PURGE_INTERVAL:
+                self._purged_at = time.time()
+                await self._purge()
+
+    async def _bootstrap(self, channel, before):
+        """Builds model from channel history, messages seen live are
+        kept"""
+
+        model = (await self._get_guild(channel.guild.id)).get(channel.id)
+        if model is not None:
+            if model.bootstrapped:
+                return model
+            if model.first_message_id is not None:
+                before = Object(model.first_message_id)
+
+        messages = await channel.history(
+            limit=BOOTSTRAP_LIMIT, oldest_first=True, before=before).flatten()
+
+        # guild could be evicted while reading history
+        models = await self._get_guild(channel.guild.id)
+        model = models.get(channel.id)
+        if model is None:
+            model = models[channel.id] = MarkovModel(self.order)
+        elif model.bootstrapped:
+            return model
+
+        # history is older than messages seen live
+        live = model.messages
+        for i, message in enumerate(messages):
+            if message.content:
+                model.add_message(message.content, age=live + len(messages) - i)
+
+        model.bootstrapped = True
+        self._dirty.add(channel.guild.id)
+
+        return model
+
+    async def get_bootstrapped_model(self, channel, before):
+        models = await self._get_guild(channel.guild.id)
+        model = models.get(channel.id)
+        if model is not None and model.bootstrapped:
+            return model
+
+        task = self._bootstrapping.get(channel.id)
+        if task is None:
+            task = self._bootstrapping[channel.id] = self.bot.loop.create_task(
+                self._bootstrap(channel, before))
+            task.add_done_callback(
+                lambda t: self._bootstrapping.pop(channel.id, None))
+
+        return await asyncio.shield(task)
+
+    def _can_read(self, ctx, channel):
+        author = channel.guild.get_member(ctx.author.id)
+        if not author or not channel.permissions_for(author).read_messages:
+            return False
+
+        return channel.is_nsfw() <= ctx.channel.is_nsfw()
+
+    async def _merge(self, models):
+        merged = MarkovModel(self.order)
+        for model in models:
+            merged.add_model(model)
+            # merging many channels takes a while
+            await asyncio.sleep(0)
+
+        merged.bootstrapped = True
+
+        return merged
+
+    async def on_call(self, ctx, args, **flags):
+        if flags.get('guild', False):
+            # only channels with models, history is not read for whole guild
+            models = await self._get_guild(ctx.guild.id)
+            channels = [
+                c for c in ctx.guild.text_channels
+                if c.id in models and self._can_read(ctx, c)
+            ]
+            if not channels:
+                return await ctx.warn('No messages seen in channels you can read')
+
+            channels.sort(key=lambda c: models[c.id].messages, reverse=True)
+            channels = channels[:MAX_GUILD_CHANNELS]
+
+            source = f'**{ctx.guild.name}** ({len(channels)} channels)'
+            models = [models[c.id] for c in channels]
+        else:
+            if len(args) == 1:
+                channels = [ctx.channel]
             else:
-                next_word = random.choice(random.choice(tuple(word_dict.values())))
-            chain.append(next_word)
+                channels = []
+                for pattern in args.args[1:MAX_CHANNELS + 1]:
+                    channel = await find_channel(
+                        pattern, ctx.guild, global_id_search=True,
+                        include_voice=False, include_category=False
+                    )
+                    if channel is None:
+                        return await ctx.warn(f'Channel **{pattern[:256]}** not found')
+                    if not isinstance(channel, TextChannel):
+                        return await ctx.warn(f'**{channel}** is not a text channel')
 
-        most_frequent_word = max(word_dict, key=lambda x: len(word_dict[x] if x else []))
+                    author = channel.guild.get_member(ctx.author.id)
+                    if not author or not channel.permissions_for(author).read_messages:
+                        return await ctx.error(f'You don\'t have permission to read messages in {channel.mention}')
+                    if channel.is_nsfw() > ctx.channel.is_nsfw():
+                        return await ctx.warn('Trying to access nsfw channel from sfw channel')
+
+                    if channel not in channels:
+                        channels.append(channel)
+
+            source = trim_text(' '.join(c.mention for c in channels), max_len=1024)
+
+            m = None
+            models = []
+            for channel in channels:
+                guild_models = await self._get_guild(channel.guild.id)
+                model = guild_models.get(channel.id)
+                if model is None or not model.bootstrapped:
+                    if m is None:
+                        m = await ctx.send('Reading message history...')
+                    try:
+                        model = await self.get_bootstrapped_model(
+                            channel, ctx.message.edited_at or ctx.message.created_at)
+                    except Exception:
+                        return await self.bot.edit_message(
+                            m, f'Failed to read message history of {channel.mention}')
+
+                models.append(model)
+
+            if m is not None:
+                await self.bot.delete_message(m)
+
+        if len(models) == 1:
+            model = models[0]
+        else:
+            model = await self.merged_cache.get(
+                tuple(sorted(c.id for c in channels)), self._merge, models)
+
+        num_words = min((random.randint(5, 100), model.words))
+        if num_words < 2:
+            return await ctx.send('Not enough words to generate text')
+
+        chain = model.generate(num_words)
+        most_frequent_word, frequency = model.most_frequent_word()
 
         e = Embed(colour=Colour.gold(), title='Markov Chain')
-        e.add_field(name='Channel', value=channel.mention)
-        e.add_field(name='Words analyzed', value=len(words))
-        e.add_field(
-            name='Most frequent word',
-            value=f'**{most_frequent_word[:256]}**: used **{len(word_dict[most_frequent_word])}** times ({round(len(word_dict[most_frequent_word]) / len(words), 4)}%)'
-        )
+        e.add_field(name='Channel' if len(channels) == 1 else 'Channels', value=source)
+        e.add_field(name='Words analyzed', value=model.words)
+        if most_frequent_word is not None:
+            e.add_field(
+                name='Most frequent word',
+                value=f'**{most_frequent_word[:256]}**: {round(frequency * 100, 2)}% of words'
+            )
         e.description = trim_text(' '.join(chain), max_len=2048)
         e.set_footer(text=ctx.author, icon_url=ctx.author.avatar_url)
 
-        await self.bot.delete_message(m)
         await ctx.send(embed=e)
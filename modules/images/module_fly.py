@@ -1,6 +1,5 @@
-import psutil
-
 from objects.modulebase import ModuleBase
+from objects.lazyimport import lazy_import
 
 import random
 import time
@@ -8,13 +7,14 @@ import os
 
 from math import sin, cos, pi
 
-from PIL import Image
-
 import discord
 
 from utils.funcs import find_image, create_subprocess_exec, execute_process
 
 
+psutil = lazy_import('psutil')
+Image = lazy_import('PIL.Image')
+
 DEG_TO_RAD_RATIO = pi / 180
 
 # fly image side (square)
@@ -41,10 +41,46 @@ MAX_SIDE = 512
 
 GIFSICLE_ARGUMENTS = ['gifsicle', '--optimize=3', '--batch', '--careful']
 
+# duration of single simulation step in milliseconds
+FRAME_DURATION = 100
+
+# frames with more separate redrawn regions are quantized as one region
+MAX_PATCHES = 4
+
 class ImageTooSmall(Exception):
     pass
 
 
+def _area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+def _union(boxes):
+    return (
+        min(b[0] for b in boxes), min(b[1] for b in boxes),
+        max(b[2] for b in boxes), max(b[3] for b in boxes)
+    )
+
+def _merge_boxes(boxes):
+    """Returns boxes with overlapping ones replaced by their union"""
+
+    merged = []
+    for box in boxes:
+        # union can overlap boxes merged earlier, they are merged again
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            if (box[0] < other[2] and other[0] < box[2] and
+                    box[1] < other[3] and other[1] < box[3]):
+                box = _union((box, merged.pop(i)))
+                i = 0
+            else:
+                i += 1
+
+        merged.append(box)
+
+    return merged
+
+
 class Fly:
 
     def __init__(self, speed=1.0):
@@ -85,7 +121,7 @@ class Fly:
                 self.angle += 90
 
         elif (new_x, new_y) != (self.pos_x, self.pos_y):
-            self._modifieed = True
+            self._modified = True
 
         self.pos_x, self.pos_y = new_x, new_y
 
@@ -132,7 +168,9 @@ class Fly:
 
 class FlyDrawer:
 
-    def __init__(self, source, flies, steps=100, fly_source=None):
+    def __init__(self, source, flies, assets, steps=100, fly_source=None):
+        self.assets = assets
+
         self.source = source.convert('RGBA')
         self.source.thumbnail((MAX_SIDE, MAX_SIDE), Image.ANTIALIAS)
 
@@ -154,51 +192,156 @@ class FlyDrawer:
         for fly in self.flies:
             fly.spawn(bounds_x, bounds_y)
 
+        # custom fly rotations, template flies are stored in assets
         self._cached_flies = {}
+
+        self._palette = self._make_palette()
+        # alpha is dropped by quantization anyway, frames are drawn in rgb
+        # to avoid converting every region
+        self._source_rgb = self.source.convert('RGB')
+        # source quantized once, used as first frame
+        self._base = self._quantize(self._source_rgb)
+        # source with flies drawn, only dirty boxes are updated
+        self._canvas = None
+        # (sprite, position) of each fly on current canvas
+        self._drawn = [None] * len(self.flies)
+
+        # list of (position, quantized region) patches for every frame,
+        # frames are rebuilt from them when gif is saved
         self._frames = []
+        self._durations = []
 
     def _get_fly_image(self, angle, state):
         name = f'{DIRECTIONS[angle]}_{state if not self.fly_source else 0}'
-        if name in self._cached_flies:
-            img = self._cached_flies[name]
-        else:
-            if self.fly_source:
+
+        if self.fly_source:
+            img = self._cached_flies.get(name)
+            if img is None:
                 img = self.fly_source.rotate(angle, expand=True)
-            else:
-                img = Image.open(f'templates/flies/{name}')
+                self._cached_flies[name] = img
+
+            return img
+
+        return self.assets.get(f'flies/{name}')
+
+    def _make_palette(self):
+        # fly colours might be missing in source, add one sprite below it
+        # before building palette
+        sprite = self._get_fly_image(list(DIRECTIONS.keys())[0], FIRST_STATE)
+
+        width, height = self.source.size
+        palette_source = Image.new('RGBA', (width, height + sprite.height))
+        palette_source.paste(self.source, (0, 0))
+        palette_source.paste(sprite, (0, height))
 
-            self._cached_flies[name] = img
+        # same method as pillow uses for rgba frames, median cut palette
+        # gives noisier frames that compress worse
+        palette = palette_source.quantize(colors=256, method=Image.FASTOCTREE)
+        palette_source.close()
 
-        return img
+        return palette
+
+    def _quantize(self, img):
+        # dithering is disabled, otherwise redrawn regions would not match
+        # the rest of the frame
+        return img.quantize(palette=self._palette, dither=Image.NONE)
+
+    def _get_box(self, sprite, position):
+        x, y = position
+        width, height = self.source.size
+
+        return (
+            max(0, x), max(0, y),
+            min(width, x + sprite.width), min(height, y + sprite.height)
+        )
+
+    def _redraw(self, box, layers):
+        region = self._source_rgb.crop(box)
+
+        for sprite, (x, y) in layers:
+            if (x >= box[2] or y >= box[3] or
+                    x + sprite.width <= box[0] or y + sprite.height <= box[1]):
+                continue
+
+            # parts outside of region are clipped by paste
+            region.paste(sprite, (x - box[0], y - box[1]), mask=sprite)
+
+        self._canvas.paste(region, box[:2])
+        region.close()
+
+    def _make_patch(self, box):
+        region = self._canvas.crop(box)
+        quantized = self._quantize(region)
+        region.close()
+
+        return box[:2], quantized
 
     def make_frame(self):
-        modified = False
+        if self._frames and not any(fly._modified for fly in self.flies):
+            self._durations[-1] += FRAME_DURATION
+            return
+
+        layers = []
         for fly in self.flies:
-            if fly._modified:
-                modified = True
-                break
+            fly._modified = False
+            layers.append(
+                (self._get_fly_image(fly.angle, fly.state), (fly.pos_x, fly.pos_y)))
+
+        if self._canvas is None:
+            self._canvas = self._source_rgb.copy()
+            dirty = [self._get_box(*layer) for layer in layers]
+        else:
+            dirty = []
+            for old, new in zip(self._drawn, layers):
+                # identity check, comparing images is expensive
+                if old[0] is not new[0] or old[1] != new[1]:
+                    dirty.extend((self._get_box(*old), self._get_box(*new)))
+
+        self._drawn = layers
 
-        if not modified:
-            self._frames.append(self._frames[-1].copy())
+        if not dirty:
+            self._durations[-1] += FRAME_DURATION
             return
 
+        # only regions around old and new fly positions are redrawn
+        dirty = _merge_boxes(dirty)
+        for box in dirty:
+            self._redraw(box, layers)
 
-        overlay = self.source.copy()
+        # quantizing has large per call overhead, scattered boxes are
+        # quantized as one region
+        bbox = _union(dirty)
+        if len(dirty) > MAX_PATCHES or 2 * sum(map(_area, dirty)) > _area(bbox):
+            dirty = [bbox]
 
-        for fly in self.flies:
-            fly._modified = False
-            img = self._get_fly_image(fly.angle, fly.state)
-            overlay.alpha_composite(img, (fly.pos_x, fly.pos_y))
+        self._frames.append([self._make_patch(box) for box in dirty])
+        self._durations.append(FRAME_DURATION)
+
+    def _iter_frames(self):
+        canvas = self._base.copy()
+        for patches in self._frames:
+            for position, patch in patches:
+                canvas.paste(patch, position)
 
-        self._frames.append(overlay)
+            # frame is copied by pillow before next one is applied
+            yield canvas
+
+        canvas.close()
 
     def cleanup(self):
-        for frame in self._frames:
-            frame.close()
+        for patches in self._frames:
+            for _, patch in patches:
+                patch.close()
 
         for image in self._cached_flies.values():
             image.close()
 
+        self._palette.close()
+        self._base.close()
+        if self._canvas is not None:
+            self._canvas.close()
+
+        self._source_rgb.close()
         self.source.close()
         if self.fly_source:
             self.fly_source.close()
@@ -211,9 +354,12 @@ class FlyDrawer:
             self.make_frame()
 
         filename = f'/tmp/fly_{time.time()}.gif'
-        self._frames[0].save(
-            filename, format='GIF', optimize=True, save_all=True,
-            append_images=self._frames[1:], loop=0 #, disposal=2 # currently broken in Pillow
+        frames = self._iter_frames()
+        # frames already share one palette, gif is optimized by gifsicle
+        next(frames).save(
+            filename, format='GIF', optimize=False, save_all=True,
+            append_images=frames, duration=self._durations,
+            loop=0 #, disposal=2 # currently broken in Pillow
         )
 
         self.cleanup()
@@ -318,7 +464,8 @@ class Module(ModuleBase):
         for i in range(amount):
             flies.append(Fly(speed=speed))
 
-        filename = FlyDrawer(source, flies, steps=steps, fly_source=fly_source).run()
+        filename = FlyDrawer(
+            source, flies, self.bot.assets, steps=steps, fly_source=fly_source).run()
         source.close()
         if fly_source:
             fly_source.close()
@@ -1,22 +1,27 @@
 from objects.modulebase import ModuleBase
+from objects.lazyimport import lazy_import
 
 import discord
 
 from io import BytesIO
 
-from PIL import Image
-from PIL.ImageOps import mirror
+from objects.image import encode_image
 
 from utils.funcs import find_image
 
 
+Image = lazy_import('PIL.Image')
+ImageOps = lazy_import('PIL.ImageOps')
+
+
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} [image]'
     short_doc = 'Makes a slap meme'
     long_doc = (
         'Flags:\n'
-        '\t[--batface|-b] <image>: uses custom second image'
+        '\t[--batface|-b] <image>: uses custom second image\n\n'
+        'Photographic results are sent as jpeg'
     )
 
     name = 'slap'
@@ -55,13 +60,13 @@ class Module(ModuleBase):
         result = await self.bot.loop.run_in_executor(
             None, self.slap, robin, bat)
 
-        await ctx.send(file=discord.File(result, filename=f'slap.png'))
+        await ctx.send(file=discord.File(result.fp, filename=f'slap.{result.extension}'))
 
     def slap(self, robin, bat):
-        template = Image.open('templates/slap.png')
+        template = self.bot.assets.copy('slap.png', mode='RGB')
 
         bat = bat.convert('RGBA')
-        bat = mirror(bat.resize((220, 220), Image.ANTIALIAS).rotate(10, expand=True))
+        bat = ImageOps.mirror(bat.resize((220, 220), Image.ANTIALIAS).rotate(10, expand=True))
 
         template.paste(bat, (460, 200), mask=bat.split()[3])
 
@@ -70,11 +75,10 @@ class Module(ModuleBase):
 
         template.paste(robin, (200, 310), mask=robin.split()[3])
 
-        result = BytesIO()
-        template.save(result, format='PNG')
+        result = encode_image(template)
 
         template.close()
         bat.close()
         robin.close()
 
-        return BytesIO(result.getvalue())
+        return result
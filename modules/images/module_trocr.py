@@ -10,22 +10,26 @@ these will be implemented. Please see README.md for details.
 """
 
 from objects.modulebase import ModuleBase
+from objects.lazyimport import lazy_import
 
 import math
-import json
 import textwrap
 import discord
 
-from io import BytesIO
+from functools import lru_cache
 from collections import deque
 
-from PIL import Image, ImageFilter, ImageDraw, ImageFont, ImageOps
+from objects.image import encode_image
+from objects.translator import TranslationError
+from objects.ocr import OCRError
 
 from utils.funcs import find_image
 
 
-OCR_API_URL = 'https://api.tsu.sh/google/ocr'
-TRANSLATE_API_URL = 'https://translate.yandex.net/api/v1.5/tr.json/'
+Image = lazy_import('PIL.Image')
+ImageFilter = lazy_import('PIL.ImageFilter')
+ImageDraw = lazy_import('PIL.ImageDraw')
+ImageFont = lazy_import('PIL.ImageFont')
 
 # I have no idea why I have this font in my system, was 1st one I've found
 # Docker image should have it
@@ -33,8 +37,48 @@ FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
 
 PX_TO_PT_RATIO = 1.3333333
 
-TRANSLATE_CAP = 10
 BLUR_CAP = 40
+BLUR_RADIUS = 10
+# fields closer than this are blurred with single crop
+BLUR_GROUP_DISTANCE = BLUR_RADIUS * 2
+
+# text with smaller angle (in degrees) is drawn without rotation
+ANGLE_THRESHOLD = 1
+
+FONT_CACHE_SIZE = 64
+
+
+def _area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+def _union(boxes):
+    return (
+        min(b[0] for b in boxes), min(b[1] for b in boxes),
+        max(b[2] for b in boxes), max(b[3] for b in boxes)
+    )
+
+def _group_boxes(boxes, distance):
+    """Returns (union, boxes) pairs of boxes closer than distance"""
+
+    groups = []
+    for box in boxes:
+        union, members = box, [box]
+        # union can get close to groups made earlier, they are merged again
+        i = 0
+        while i < len(groups):
+            other, other_members = groups[i]
+            if (union[0] - distance < other[2] and other[0] - distance < union[2] and
+                    union[1] - distance < other[3] and other[1] - distance < union[3]):
+                groups.pop(i)
+                union = _union((union, other))
+                members += other_members
+                i = 0
+            else:
+                i += 1
+
+        groups.append((union, members))
+
+    return groups
 
 
 class TROCRException(Exception):
@@ -230,7 +274,8 @@ class Module(ModuleBase):
     short_doc = 'Translates text on image'
     long_doc = (
         'Flags:\n'
-        '\t[--language|-l] <language=\'en\'>: output language'
+        '\t[--language|-l] <language=\'en\'>: output language\n\n'
+        'Photographic results are sent as jpeg, or webp if they have transparency'
     )
 
     name = 'trocr'
@@ -245,39 +290,28 @@ class Module(ModuleBase):
     ratelimit = (1, 15)
 
     async def on_load(self, from_reload):
-        self.font = ImageFont.truetype(FONT_PATH)
-
-        # copied from module_goodtranslator2.py
-        self.api_key = self.bot.config.get('yandex_api_key')
-        if self.api_key:
-            params = {
-                'key': self.api_key,
-                'ui': 'en'
-            }
-
-            async with self.bot.sess.get(TRANSLATE_API_URL + 'getLangs', params=params) as r:
-                if r.status == 200:
-                    self.langs = (await r.json())['langs']
-                    return
-
-        raise Exception('No yandex api key in config or key is invalid')
-
-    async def translate(self, text, in_lang, out_lang):
-        params = {
-            'key': self.api_key,
-            'text': text,
-            'lang': f'{in_lang}-{out_lang}' if in_lang in self.langs else out_lang
-        }
+        # fonts by size, shared between draw calls. Loaded on first draw,
+        # pillow is not imported at startup
+        self._get_font = lru_cache(maxsize=FONT_CACHE_SIZE)(
+            lambda size: ImageFont.truetype(FONT_PATH, size=size)
+        )
 
-        try:
-            async with self.bot.sess.post(TRANSLATE_API_URL + 'translate', params=params) as r:
-                if r.status != 200:
-                    return f"[HTTP {r.status}] Error"
+        self.langs = await self.bot.translator.get_languages('yandex')
+
+    async def translate(self, lines, in_lang, out_lang):
+        """Translates multiple lines using single request. Returns
+        (translated lines, number of successful translations) pair, lines are
+        replaced with error on failure"""
 
-                r_json = await r.json()
-                return r_json['text'][0]
+        try:
+            translations = await self.bot.translator.translate_many(
+                lines, out_lang, src=in_lang if in_lang in self.langs else None)
+        except TranslationError as e:
+            return [str(e)] * len(lines), 0
         except Exception:
-            return "Error translating"
+            return ["Error translating"] * len(lines), 0
+
+        return [t.text for t in translations], len(translations)
 
     async def on_call(self, ctx, args, **flags):
         if args[1:].lower() == 'list':
@@ -292,35 +326,12 @@ class Module(ModuleBase):
         if lang_flag and lang_flag.lower() not in self.langs:
             return await ctx.warn('Invalid input language. Try using `list` subcommand')
 
-        # everything below is copied from module_ocr.py
-        async with ctx.session.get(
-            OCR_API_URL,
-            params=dict(q=image.url, raw=1),
-            headers={'User-Agent': 'KiwiBot'},
-        ) as r:
-            if r.status != 200:
-                if r.content_type.lower() != 'application/json':
-                    # something went terribly wrong
-                    return await ctx.error(
-                        f'Something really bad happened with underlying OCR API: {r.status}'
-                    )
-
-                try:
-                    json = await r.json()
-                except json.JSONDecodeError:
-                    return await ctx.error(
-                        'Unable to process response from OCR API'
-                    )
-
-                return await ctx.error(
-                    f'Error in underlying OCR API[{r.status}]: '
-                    f'{json.get("message", "[MISSING]")}'
-                )
-            json = await r.json()
-
-        # everything above is copied from module_ocr.py
+        try:
+            annotations = await self.bot.ocr.recognize(image)
+        except OCRError as e:
+            return await ctx.error(str(e))
 
-        text_annotations = json["responses"][0].get("textAnnotations")
+        text_annotations = annotations["responses"][0].get("textAnnotations")
         if not text_annotations:
             return await ctx.warn("No text detected")
 
@@ -332,17 +343,20 @@ class Module(ModuleBase):
         # lines, lines are separated by newlines, there is a trailing newline.
         # Coordinates from words in the same line can be merged
         current_word = 1  # 1st annotation is entire text
-        translations_count = 0
-        fields = []
-        for line in text_annotations[0]["description"].split("\n")[:-1]:
-            translated_line = line
-            if translations_count < TRANSLATE_CAP:
-                in_lang = text_annotations[0]["locale"]
-                # seems like "und" is an unknown language
-                if in_lang != "und" and in_lang != lang_flag:
-                    translated_line = await self.translate(line, in_lang, lang_flag)
-                    translations_count += 1
+        # lines past BLUR_CAP are not drawn, they are not translated either
+        lines = text_annotations[0]["description"].split("\n")[:-1][:BLUR_CAP]
+
+        in_lang = text_annotations[0]["locale"]
+        # seems like "und" is an unknown language
+        if in_lang != "und" and in_lang != lang_flag:
+            translated_lines, translations_count = await self.translate(
+                lines, in_lang, lang_flag)
+        else:
+            translated_lines = lines
+            translations_count = 0
 
+        fields = []
+        for line, translated_line in zip(lines, translated_lines):
             field = TextField(translated_line, src)
 
             for word in text_annotations[current_word:]:
@@ -367,47 +381,44 @@ class Module(ModuleBase):
 
         send_fn = ctx.warn if notes else ctx.send
 
-        stats = f'Words: {current_word - 1}\nLines: {len(fields)}\nTranslated: {translations_count}'
+        stats = (
+            f'Words: {current_word - 1}\nLines: {len(fields)}\nTranslated: {translations_count}'
+            f'\nOutput: {result}'
+        )
         if notes:
             stats += f'\nNotes: {notes}'
 
-        await send_fn(stats, file=discord.File(result, filename=f'trocr.png'))
+        await send_fn(stats, file=discord.File(result.fp, filename=f'trocr.{result.extension}'))
 
     def draw(self, src, fields):
         src = src.convert("RGBA")
 
         fields = fields[:BLUR_CAP]
 
-        for field in fields:
-            cropped = src.crop(field.coords_padded)
-
-            # NOTE: next line causes segfaults if coords are wrong, debug from here
-            blurred = cropped.filter(ImageFilter.GaussianBlur(10))
-
-            # Does not work anymore for some reason, black stroke is good anyway
-            # field.inverted_avg_color = ImageOps.invert(
-            #     blurred.resize((1, 1)).convert("L")
-            # ).getpixel((0, 0))  # ugly!!!
-
-            src.paste(blurred, field.coords_padded)
-
-            # might not be needed, but fly command creates memory leak
-            cropped.close()
-            blurred.close()
+        if fields:
+            self._blur_fields(src, fields)
 
+        # (font, text size) for each field
+        layouts = []
         for field in fields:
-            # TODO: figure out how to fit text into boxes with Pillow without creating
-            # extra images
-            font = self.font.font_variant(size=field.font_size)
+            font = self._get_font(field.font_size)
+            layouts.append(
+                (font, font.getsize(field.text, stroke_width=field.stroke_width))
+            )
 
-            text_im = Image.new(
-                "RGBA",
-                size=font.getsize(field.text, stroke_width=field.stroke_width),
+        # every rotated or shrinked text is rendered on this surface
+        scratch = Image.new(
+            "RGBA",
+            size=(
+                max((size[0] for _, size in layouts), default=1),
+                max((size[1] for _, size in layouts), default=1),
             )
-            draw = ImageDraw.Draw(text_im)
+        )
+        scratch_draw = ImageDraw.Draw(scratch)
+        src_draw = ImageDraw.Draw(src)
 
-            draw.text(
-                (0, 0),
+        for field, (font, (width, height)) in zip(fields, layouts):
+            text_kwargs = dict(
                 text=field.text,
                 font=font,
                 spacing=0,
@@ -415,6 +426,17 @@ class Module(ModuleBase):
                 stroke_fill=(0, 0, 0),
             )
 
+            is_straight = field.angle < ANGLE_THRESHOLD or field.angle > 360 - ANGLE_THRESHOLD
+            if is_straight and width <= field.width and height <= field.height:
+                src_draw.text(field.coords_padded[:2], **text_kwargs)
+
+                continue
+
+            scratch.paste((0, 0, 0, 0), (0, 0, width, height))
+            scratch_draw.text((0, 0), **text_kwargs)
+
+            text_im = scratch.crop((0, 0, width, height))
+
             src.alpha_composite(
                 text_im.resize(
                     (
@@ -427,9 +449,50 @@ class Module(ModuleBase):
 
             text_im.close()
 
-        result = BytesIO()
-        src.save(result, format='PNG')
+        scratch.close()
+
+        result = encode_image(src)
 
         src.close()
 
-        return BytesIO(result.getvalue())
+        return result
+
+    def _blur_fields(self, src, fields):
+        """Blurs nearby fields with single crop, filter and paste. Fields
+        of group are blurred separately if group box is mostly empty"""
+
+        groups = _group_boxes(
+            [field.coords_padded for field in fields], BLUR_GROUP_DISTANCE)
+
+        for box, boxes in groups:
+            if _area(box) > 2 * sum(_area(b) for b in boxes):
+                for b in boxes:
+                    self._blur_boxes(src, b, (b, ))
+            else:
+                self._blur_boxes(src, box, boxes)
+
+    def _blur_boxes(self, src, box, boxes):
+        mask = Image.new("L", (box[2] - box[0], box[3] - box[1]))
+        mask_draw = ImageDraw.Draw(mask)
+        for left, upper, right, lower in boxes:
+            mask_draw.rectangle(
+                (left - box[0], upper - box[1], right - box[0] - 1, lower - box[1] - 1),
+                fill=255
+            )
+
+        cropped = src.crop(box)
+
+        # NOTE: next line causes segfaults if coords are wrong, debug from here
+        blurred = cropped.filter(ImageFilter.GaussianBlur(BLUR_RADIUS))
+
+        # Does not work anymore for some reason, black stroke is good anyway
+        # field.inverted_avg_color = ImageOps.invert(
+        #     blurred.resize((1, 1)).convert("L")
+        # ).getpixel((0, 0))  # ugly!!!
+
+        src.paste(blurred, box, mask=mask)
+
+        # might not be needed, but fly command creates memory leak
+        cropped.close()
+        blurred.close()
+        mask.close()
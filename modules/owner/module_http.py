@@ -0,0 +1,61 @@
+from objects.modulebase import ModuleBase
+from objects.permissions import PermissionBotOwner
+
+
+class Module(ModuleBase):
+
+    usage_doc = '{prefix}{aliases}'
+    short_doc = 'Show http connection pool and external service statistics'
+
+    name = 'http'
+    aliases = (name, 'httpstats')
+    category = 'Owner'
+    user_perms = (PermissionBotOwner(), )
+    hidden = True
+
+    async def on_call(self, ctx, args, **flags):
+        result = ''
+        for session_name, stats in self.bot.http_client.get_stats():
+            if session_name != 'direct':
+                # do not expose proxy url
+                session_name = self.bot.proxies.get(session_name, 'unknown proxy')
+
+            result += (
+                f'{session_name[:20]:<20} | {stats.get("requests", 0):<8} | '
+                f'{stats.get("errors", 0):<6} | '
+                f'{stats.get("connections_created", 0):<5} | '
+                f'{stats.get("connections_reused", 0):<6} | '
+                f'{stats["in_use"]:<3}/{stats["idle"]:<4} | '
+                f'{stats.get("dns_cache_hits", 0)}/{stats.get("dns_cache_misses", 0)}\n'
+            )
+
+        if not result:
+            return await ctx.info('HTTP client is not started')
+
+        header = (
+            f'{"SESSION":<20} | {"REQUESTS":<8} | {"ERRORS":<6} | {"NEW":<5} | '
+            f'{"REUSED":<6} | {"USE/IDLE":<8} | DNS HIT/MISS\n'
+        )
+        header += f'{"-" * 21}+{"-" * 10}+{"-" * 8}+{"-" * 7}+{"-" * 8}+{"-" * 10}+{"-" * 13}\n'
+
+        services = ''
+        for name, stats in self.bot.services.get_stats():
+            p50 = '-' if stats['p50'] is None else f'{round(stats["p50"] * 1000)}ms'
+            p95 = '-' if stats['p95'] is None else f'{round(stats["p95"] * 1000)}ms'
+            errors = f'{stats["failures"]}/{stats["proxy_failures"]}'
+            services += (
+                f'{name[:20]:<20} | {stats["state"]:<9} | {stats["requests"]:<8} | '
+                f'{errors:<9} | {stats["rejected"]:<8} | '
+                f'{stats["coalesced"]:<9} | {stats["retries"]:<7} | {p50}/{p95}\n'
+            )
+
+        if services:
+            services_header = (
+                f'{"SERVICE":<20} | {"STATE":<9} | {"REQUESTS":<8} | {"ERR/PROXY":<9} | '
+                f'{"REJECTED":<8} | {"COALESCED":<9} | {"RETRIES":<7} | P50/P95\n'
+            )
+            services_header += f'{"-" * 21}+{"-" * 11}+{"-" * 10}+{"-" * 11}+{"-" * 10}+{"-" * 11}+{"-" * 9}+{"-" * 14}\n'
+
+            services = f'\n{services_header}{services}'
+
+        return f'```\n{header}{result}{services}```'
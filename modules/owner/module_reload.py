@@ -12,6 +12,7 @@ class Module(ModuleBase):
         'Targets:\n'
         '\tbot: restarts bot\n'
         '\tmodules: reloads all modules\n'
+        '\tassets: reloads image templates\n'
         '\t<command_alias>: reload selected module'
     )
 
@@ -46,6 +47,21 @@ class Module(ModuleBase):
                 'reload_data', f'{reload_message.channel.id}:{reload_message.id}')
             return self.bot.restart()
 
+        if target == 'assets':
+            try:
+                count = await self.bot.loop.run_in_executor(
+                    None, self.bot.assets.reload)
+            except Exception:
+                response = f'Failed to reload assets. Exception:```py\n{traceback.format_exc()}```'
+
+                return await self.bot.edit_message(
+                    reload_message,
+                    content=response
+                )
+
+            return await self.bot.edit_message(
+                reload_message, content=f'Reloaded {count} assets')
+
         if target == 'modules':
             try:
                 await self.bot.mm.reload_modules()
@@ -1,11 +1,13 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
+from objects.image import encode_image
+from objects.lazyimport import lazy_import
 
 from discord import Colour, File, Embed
 
-from PIL import Image, ImageColor
 
-from io import BytesIO
+Image = lazy_import('PIL.Image')
+ImageColor = lazy_import('PIL.ImageColor')
 
 
 class Module(ModuleBase):
@@ -26,14 +28,13 @@ class Module(ModuleBase):
         except ValueError as e:
             return await ctx.warn('Not a colour')
 
-        bytes_img = BytesIO()
         img = Image.new('RGB', (100, 100), rgb)
-        img.save(bytes_img, format='JPEG')
-        bytes_img.seek(0)
-        file = File(bytes_img, filename='img.jpg')
+        encoded = encode_image(img, photographic=False)
+        filename = f'img.{encoded.extension}'
+        file = File(encoded.fp, filename=filename)
 
         e = Embed(colour=colour, title=str(colour))
         e.add_field(name='Decimal value', value=colour.value)
-        e.set_image(url='attachment://img.jpg')
+        e.set_image(url=f'attachment://{filename}')
 
         await ctx.send(embed=e, file=file)
@@ -1,9 +1,11 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionManageRoles
+from objects.lazyimport import lazy_import
 
 from discord import Colour
 
-from PIL import ImageColor
+
+ImageColor = lazy_import('PIL.ImageColor')
 
 
 class Module(ModuleBase):
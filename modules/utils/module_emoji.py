@@ -48,26 +48,26 @@ class Module(ModuleBase):
             text = text.rstrip("\N{VARIATION SELECTOR-16}")
 
             code = '-'.join(map(lambda c: f'{ord(c):x}', text))
-            async with self.bot.sess.get(TWEMOJI_ENDPOINT.format(code)) as r:
-                if r.status != 200:
-                    return await ctx.warn('Could not get emoji from input text')
-                        
-                filename = 'emoji.png'
-                f = File(BytesIO(await r.read()), filename=filename)
-                e.title = f'TWEmoji'
-                e.set_image(url=f'attachment://{filename}')
+            r = await self.bot.services.get('twemoji').get(TWEMOJI_ENDPOINT.format(code))
+            if r.status != 200:
+                return await ctx.warn('Could not get emoji from input text')
+
+            filename = 'emoji.png'
+            f = File(BytesIO(r.body), filename=filename)
+            e.title = f'TWEmoji'
+            e.set_image(url=f'attachment://{filename}')
         else:
             e.set_footer(text=emoji_id)
             emoji = self.bot.get_emoji(emoji_id)
             if emoji is None:
-                async with self.bot.sess.get(EMOJI_ENDPOINT.format(emoji_id)) as r:
-                    if r.status != 200:
-                        return await ctx.error('Emoji with given id not found')
-                        
-                    filename = f'emoji.{r.content_type[6:]}'
-                    f = File(BytesIO(await r.read()), filename=filename)
-                    e.title = f'Emoji {emoji_name or ""}'
-                    e.set_image(url=f'attachment://{filename}')
+                r = await self.bot.services.get('discord_cdn').get(EMOJI_ENDPOINT.format(emoji_id))
+                if r.status != 200:
+                    return await ctx.error('Emoji with given id not found')
+
+                filename = f'emoji.{r.content_type[6:]}'
+                f = File(BytesIO(r.body), filename=filename)
+                e.title = f'Emoji {emoji_name or ""}'
+                e.set_image(url=f'attachment://{filename}')
             else:
                 e.title = f'Emoji {emoji.name}'
                 e.set_image(url=emoji.url)
@@ -1,5 +1,6 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
+from objects.lazyimport import lazy_import
 
 from utils.funcs import create_subprocess_shell, execute_process, get_local_prefix
 from constants import DEV_GUILD_INVITE, ASCII_ART
@@ -7,12 +8,14 @@ from constants import DEV_GUILD_INVITE, ASCII_ART
 from discord import Colour, Embed
 import discord
 
-import psutil
 
 import os
 import sys
 
 
+psutil = lazy_import('psutil')
+
+
 class Module(ModuleBase):
 
     short_doc = 'Bot stats/information'
@@ -23,8 +26,15 @@ class Module(ModuleBase):
     bot_perms = (PermissionEmbedLinks(), )
 
     async def on_load(self, from_reload):
-        self.process = psutil.Process()
-        self.process.cpu_percent()
+        # psutil is imported in executor to not delay startup
+        self.process = await self.bot.loop.run_in_executor(None, self._create_process)
+
+    def _create_process(self):
+        process = psutil.Process()
+        # first call primes cpu usage counter
+        process.cpu_percent()
+
+        return process
 
     async def on_call(self, ctx, args, **flags):
         git_url = None
@@ -1,15 +1,12 @@
 from objects.modulebase import ModuleBase
+from objects.proxymanager import PROXY_TEST_URL
 
 from utils.funcs import create_subprocess_exec, execute_process
 
 import re
 import asyncio
-import time
 
 
-PROXY_TEST_URL = 'https://httpbin.org'
-PROXY_TEST_TIMEOUT = 5
-
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} [url]'
@@ -33,34 +30,32 @@ class Module(ModuleBase):
                 result = ''
                 async def ping_task(url, name):
                     nonlocal result
-                    begin = time.time()
-                    try:
-                        r = await self.bot.sess.head(
-                                PROXY_TEST_URL, proxy=url, timeout=PROXY_TEST_TIMEOUT)
-                    except Exception as e:
+                    success, latency, comment = await self.bot.proxy_manager.check(url)
+                    if latency is None:
                         response_time = '-'
-                        comment = f'Ping {PROXY_TEST_URL}: {e.__class__.__name__}'
+                        comment = f'Ping {PROXY_TEST_URL}: {comment}'
                     else:
-                        response_time = str(round((time.time() - begin) * 1000))
+                        response_time = str(round(latency * 1000))
                         if len(response_time) > 4:
                             response_time = "999+"
 
                         response_time += 'ms'
 
-                        if r.status == 200:
-                            comment = 'ok'
-                        else:
-                            comment = f'Error pinging {PROXY_TEST_URL}: {r.status}'
+                        if not success:
+                            comment = f'Error pinging {PROXY_TEST_URL}: {comment}'
+
+                    stats = self.bot.proxy_manager.get_stats(url)
+                    score = 'ejected' if stats.ejected else f'{round(stats.error_rate * 100)}% err'
 
-                    result += f'{name:<20} | {response_time:<6} | {comment}\n'
+                    result += f'{name:<20} | {response_time:<6} | {score:<8} | {comment}\n'
 
                 for url, name in self.bot.proxies.items():
                     tasks.append(ping_task(url, name))
 
                 await asyncio.gather(*tasks)
 
-                header = f'{"NAME":<20} | {"TIME":<6} | COMMENT\n'
-                header += f'{"-" * 21}+{"-" * 8}+{"-" * 21}\n'
+                header = f'{"NAME":<20} | {"TIME":<6} | {"HEALTH":<8} | COMMENT\n'
+                header += f'{"-" * 21}+{"-" * 8}+{"-" * 10}+{"-" * 21}\n'
 
                 return await self.bot.edit_message(ping_msg, f'```\n{header}{result}```')
 
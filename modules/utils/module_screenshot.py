@@ -1,33 +1,310 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks, PermissionAttachFiles
+from objects.lazyimport import lazy_import
+from objects.logger import Logger
+from objects.resultcache import ResultCache
 
 import re
 import time
 import asyncio
 import aiohttp
 
+from io import BytesIO
 from os import devnull
+from urllib.parse import urlsplit, urlunsplit
 from async_timeout import timeout
 
 from discord import Embed, Colour, File
-from arsenic import start_session, stop_session, services, browsers
-from arsenic.errors import WebdriverError, ArsenicError
 
 import logging
-import structlog
 
 
-logger = logging.getLogger('arsenic')
-logger.setLevel(logging.CRITICAL)
+arsenic_logger = logging.getLogger('arsenic')
+arsenic_logger.setLevel(logging.CRITICAL)
 
-structlog.configure(logger_factory=lambda: logger)
+
+def _configure_structlog(arsenic):
+    import structlog
+
+    # loggers created by arsenic are lazy, they pick up configuration on first use
+    structlog.configure(logger_factory=lambda: arsenic_logger)
+
+arsenic = lazy_import('arsenic', on_import=_configure_structlog)
+arsenic_errors = lazy_import('arsenic.errors', on_import=_configure_structlog)
 
 TIMEOUT = 15
 DEFAULT_WAIT_TIME = 2
 MAX_WAIT_TIME = 10
 
+# browser is restarted after this number of pages
+MAX_PAGES = 25
+# seconds between checks of idle browsers
+HEALTH_CHECK_INTERVAL = 60
+# seconds to wait for free browser
+QUEUE_TIMEOUT = 60
+# browser launch attempts before proxy is given up until next health check
+LAUNCH_ATTEMPTS = 4
+# seconds before failed browser launch is retried, doubled after each attempt
+LAUNCH_RETRY_DELAY = 10
+
+WINDOW_SIZE = (1920, 1080)
+
+# seconds to keep screenshots
+CACHE_TTL = 300
+# total bytes of cached screenshots
+CACHE_SIZE = 64 * 1024 * 1024
+
+BROWSER_ARGS = [
+    '--no-sandbox', '--headless', '--disable-gpu', '--lang=en',
+    '--limit-fps=1', '--disable-mojo-local-storage',
+    '--hide-scrollbars', '--ipc-connection-timeout=5',
+]
+
+CLEAR_STORAGE_SCRIPT = 'try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}'
+
 FIX_SLASHES_REGEX = re.compile(r'(?<!:)/{2,}')
 
+logger = Logger.get_logger()
+
+
+def normalize_url(url):
+    """Returns url suitable for cache key"""
+
+    parts = urlsplit(url)
+
+    return urlunsplit((
+        parts.scheme.lower(), parts.netloc.lower(),
+        FIX_SLASHES_REGEX.sub('/', parts.path) or '/', parts.query, ''
+    ))
+
+
+class ScreenshotError(Exception):
+    pass
+
+
+class Browser:
+    __slots__ = ('proxy', 'session', 'pages')
+
+    def __init__(self, proxy, session):
+        self.proxy = proxy
+        self.session = session
+        self.pages = 0
+
+
+class BrowserPool:
+    """Browser sessions launched in advance, one for each proxy.
+
+    Browsers are cleaned up after every page and restarted after max_pages
+    pages or on errors. Proxy is given up after LAUNCH_ATTEMPTS failed
+    launches and retried on next health check.
+    """
+
+    def __init__(self, bot, proxies, max_pages=MAX_PAGES):
+        self.bot = bot
+        self.proxies = proxies
+        self.max_pages = max_pages
+
+        # None in queue wakes waiters up after last browser failed to launch
+        self._idle = asyncio.Queue()
+        self._tasks = set()
+        self._health_task = None
+        # proxies failed to launch browser
+        self._failed = set()
+        # idle browsers taken out of queue by health check
+        self._checking = 0
+
+        self.waiting = 0
+        self.closed = False
+        self.last_error = None
+
+    @property
+    def available(self):
+        return len(self.proxies) > len(self._failed)
+
+    @property
+    def queue_position(self):
+        """Position new request would get in queue, 0 if browser is free"""
+
+        if not self._idle.empty():
+            return 0
+
+        # browsers being checked return to queue shortly
+        return max(0, self.waiting + 1 - self._checking)
+
+    def start(self):
+        for proxy in self.proxies:
+            self._spawn(self._launch(proxy))
+
+        self._health_task = self.bot.loop.create_task(self._health_check_task())
+
+    def _spawn(self, coro):
+        task = self.bot.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _launch(self, proxy):
+        for attempt in range(LAUNCH_ATTEMPTS):
+            if self.closed:
+                return
+
+            session = None
+            try:
+                service = arsenic.services.Chromedriver(log_file=devnull)
+                browser = arsenic.browsers.Chrome(
+                    chromeOptions={'args': [*BROWSER_ARGS, f'--proxy-server={proxy}']})
+
+                async with timeout(TIMEOUT):
+                    session = await arsenic.start_session(service, browser)
+                    await session.set_window_size(*WINDOW_SIZE)
+            except asyncio.CancelledError:
+                if session is not None:
+                    await self._stop_session(session)
+
+                raise
+            except Exception as e:
+                if session is not None:
+                    await self._stop_session(session)
+
+                self.last_error = f'{e.__class__.__name__}: {e}'
+                logger.info(
+                    f'Failed to launch browser with proxy {self.bot.proxies.get(proxy, proxy)} '
+                    f'({attempt + 1}/{LAUNCH_ATTEMPTS}): {self.last_error}'
+                )
+
+                if attempt + 1 < LAUNCH_ATTEMPTS:
+                    await asyncio.sleep(LAUNCH_RETRY_DELAY * 2 ** attempt)
+
+                continue
+
+            if self.closed:
+                await self._stop_session(session)
+            else:
+                self._idle.put_nowait(Browser(proxy, session))
+
+            return
+
+        self._failed.add(proxy)
+        if not self.available:
+            logger.info('All screenshot browsers failed to launch')
+            for _ in range(self.waiting):
+                self._idle.put_nowait(None)
+
+    async def acquire(self):
+        """Returns free browser. Raises ScreenshotError if browsers failed
+        to launch"""
+
+        self.waiting += 1
+        try:
+            while True:
+                if not self.available:
+                    raise ScreenshotError(
+                        f'Browser failed to start: {self.last_error}')
+
+                browser = await self._idle.get()
+                if browser is not None:
+                    return browser
+        finally:
+            self.waiting -= 1
+
+    def release(self, browser, failed=False):
+        browser.pages += 1
+
+        if failed or browser.pages >= self.max_pages or self.closed:
+            self._spawn(self._recycle(browser))
+        else:
+            self._spawn(self._reset(browser))
+
+    async def _reset(self, browser):
+        # cookies and storage are cleared for the last opened page
+        try:
+            async with timeout(TIMEOUT):
+                await browser.session.delete_all_cookies()
+                await browser.session.execute_script(CLEAR_STORAGE_SCRIPT)
+                await browser.session.get('about:blank')
+        except asyncio.CancelledError:
+            await self._stop_session(browser.session)
+
+            raise
+        except Exception:
+            return await self._recycle(browser)
+
+        if self.closed:
+            await self._stop_session(browser.session)
+        else:
+            self._idle.put_nowait(browser)
+
+    async def _recycle(self, browser):
+        await self._stop_session(browser.session)
+
+        if not self.closed:
+            await self._launch(browser.proxy)
+
+    async def _stop_session(self, session):
+        try:
+            await arsenic.stop_session(session)
+        except Exception:
+            pass
+
+    async def _check(self, browser):
+        try:
+            async with timeout(5):
+                await browser.session.get_url()
+        except asyncio.CancelledError:
+            self._checking -= 1
+            await self._stop_session(browser.session)
+
+            raise
+        except Exception:
+            self._checking -= 1
+            logger.info('Browser health check failed, restarting')
+
+            return await self._recycle(browser)
+
+        self._checking -= 1
+        self._idle.put_nowait(browser)
+
+    async def _health_check_task(self):
+        while not self.closed:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+            for proxy in tuple(self._failed):
+                self._failed.discard(proxy)
+                self._spawn(self._launch(proxy))
+
+            idle = []
+            while not self._idle.empty():
+                browser = self._idle.get_nowait()
+                if browser is not None:
+                    idle.append(browser)
+
+            self._checking += len(idle)
+            for browser in idle:
+                self._spawn(self._check(browser))
+
+    def get_stats(self):
+        return {
+            'idle': self._idle.qsize(),
+            'checking': self._checking,
+            'failed': len(self._failed),
+            'waiting': self.waiting,
+            'tasks': len(self._tasks),
+        }
+
+    async def close(self):
+        self.closed = True
+
+        if self._health_task is not None:
+            self._health_task.cancel()
+
+        for task in tuple(self._tasks):
+            task.cancel()
+
+        while not self._idle.empty():
+            browser = self._idle.get_nowait()
+            if browser is not None:
+                await self._stop_session(browser.session)
+
+
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <url>'
@@ -52,7 +329,27 @@ class Module(ModuleBase):
     }
 
     async def on_load(self, from_reload):
-        self.lock = asyncio.Lock()
+        # on_load is called again after reconnect, running browsers are kept
+        if hasattr(self, 'pool'):
+            return
+
+        # (url, window size, wait time): (opened url, png bytes)
+        self._results = ResultCache(
+            self.bot, CACHE_SIZE, CACHE_TTL, sizeof=lambda r: len(r[1]))
+        # key: messages of callers waiting for screenshot
+        self._waiters = {}
+        # key: last status of screenshot
+        self._status = {}
+
+        self.pool = BrowserPool(self.bot, list(self.bot.proxies))
+
+        if self.bot.proxies:
+            self.pool.start()
+        else:
+            logger.info('No proxies in config, screenshot browsers are not launched')
+
+    async def on_unload(self):
+        await self.pool.close()
 
     async def on_call(self, ctx, args, **flags):
         try:
@@ -74,75 +371,126 @@ class Module(ModuleBase):
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
 
-        proxy = self.bot.get_proxy()
+        # recent screenshot of the same url is sent without preflight request
+        key = (normalize_url(url), WINDOW_SIZE, wait_time)
+        found, result = self._results.peek(key)
+        if found:
+            return await self.send_screenshot(ctx, m, *result)
+
+        await self._ratelimiter.increase_time(wait_time, ctx)
+
+        # concurrent requests for the same page share single screenshot, every
+        # caller gets status updates
+        waiters = self._waiters.setdefault(key, [])
+        waiters.append(m)
+        if key in self._status:
+            await self.bot.edit_message(m, self._status[key])
 
         try:
-            async with self.bot.sess.head(url, timeout=TIMEOUT, proxy=proxy) as r:
+            result = await self._results.get(key, self.take_screenshot, key, url, wait_time)
+        except ScreenshotError as e:
+            return await self.bot.edit_message(m, str(e))
+        finally:
+            waiters.remove(m)
+            if not waiters:
+                self._waiters.pop(key, None)
+                self._status.pop(key, None)
+
+        await self.send_screenshot(ctx, m, *result)
+
+    async def set_status(self, key, text):
+        self._status[key] = text
+        for m in tuple(self._waiters.get(key, ())):
+            await self.bot.edit_message(m, text)
+
+    async def preflight(self, browser, url):
+        """Returns url after redirects, checked through browser proxy"""
+
+        proxy = browser.proxy
+
+        begin = time.time()
+        try:
+            async with self.bot.http_client.get_session(proxy).head(url, timeout=TIMEOUT) as r:
+                # errors are not reported, they are likely caused by url
+                self.bot.report_proxy(proxy, True, time.time() - begin)
                 if (r.content_length or 0) > 100000000:
-                    return await self.bot.edit_message(
-                        m, 'Rejected to navigate, content is too long')
-                url = str(r.url)
+                    raise ScreenshotError('Rejected to navigate, content is too long')
+
+                return str(r.url)
         except asyncio.TimeoutError:
-            return await self.bot.edit_message(m, 'Connection timeout')
+            raise ScreenshotError('Connection timeout')
         except aiohttp.InvalidURL:
-            return await self.bot.edit_message(m, 'Invalid url given')
+            raise ScreenshotError('Invalid url given')
         except aiohttp.ClientHttpProxyError:
-            return await self.bot.edit_message(m, 'Host resolution error')
+            raise ScreenshotError('Host resolution error')
         except (aiohttp.ClientConnectorCertificateError, aiohttp.ClientConnectorSSLError):
-            return await self.bot.edit_message(
-                m, f'Can\'t establish secure connection to {url}\nTry using http:// protocol')
+            raise ScreenshotError(
+                f'Can\'t establish secure connection to {url}\nTry using http:// protocol')
         except aiohttp.ClientConnectionError as e:
-            return await self.bot.edit_message(
-                m, f'Unknown connection error happened: {e}\nTry using http:// protocol')
+            raise ScreenshotError(
+                f'Unknown connection error happened: {e}\nTry using http:// protocol')
         except aiohttp.ClientResponseError as e:
-            return await self.bot.edit_message(
-                m, f'Client response error: {e}')
+            raise ScreenshotError(f'Client response error: {e}')
 
-        await self._ratelimiter.increase_time(wait_time, ctx)
+    async def take_screenshot(self, key, url, wait_time):
+        """Returns (opened url, png bytes) pair"""
 
-        await self.lock.acquire()
- 
-        service = services.Chromedriver(log_file=devnull)
-        browser = browsers.Chrome(
-            chromeOptions={
-                'args': [
-                    '--no-sandbox', '--headless', '--disable-gpu',
-                    f'--proxy-server={proxy}', '--lang=en',
-                    '--limit-fps=1', '--disable-mojo-local-storage',
-                    '--hide-scrollbars', '--ipc-connection-timeout=5',
-                ]
-            }
-        )
+        position = self.pool.queue_position
+        if position:
+            await self.set_status(
+                key, f'Taking screenshot... Position in queue: **{position}**')
 
         try:
-            async with timeout(TIMEOUT + wait_time):
-                session = await start_session(service, browser)
-                await session.set_window_size(1920, 1080)
+            async with timeout(QUEUE_TIMEOUT):
+                browser = await self.pool.acquire()
+        except asyncio.TimeoutError:
+            raise ScreenshotError('All browsers are busy, please try again later')
+
+        if position:
+            await self.set_status(key, 'Taking screenshot...')
+
+        try:
+            url = await self.preflight(browser, url)
+        except BaseException:
+            self.pool.release(browser)
+
+            raise
+
+        # url could redirect to recently opened page
+        resolved_key = (normalize_url(url), WINDOW_SIZE, wait_time)
+        found, result = self._results.peek(resolved_key)
+        if found:
+            self.pool.release(browser)
+
+            return result
 
-                await session.get(url)
-                opened_url = await session.get_url()
+        failed = True
+        try:
+            async with timeout(TIMEOUT + wait_time):
+                await browser.session.get(url)
+                opened_url = await browser.session.get_url()
                 await asyncio.sleep(wait_time)
-                screenshot = await session.get_screenshot()
+                screenshot = await browser.session.get_screenshot()
+
+            failed = False
         except asyncio.TimeoutError:
-            return await self.bot.edit_message(
-                m, f'Screenshot timeout reached: **{TIMEOUT}** sec')
-        except WebdriverError as e:
-            return await self.bot.edit_message(
-                m, f'Browser error happened, unable to take a screenshot: {e.__class__.__name__}')
-        except ArsenicError as e:
-            return await self.bot.edit_message(
-                 m, f'Client error happened: {e}')
+            raise ScreenshotError(f'Screenshot timeout reached: **{TIMEOUT}** sec')
+        except arsenic_errors.WebdriverError as e:
+            raise ScreenshotError(
+                f'Browser error happened, unable to take a screenshot: {e.__class__.__name__}')
+        except arsenic_errors.ArsenicError as e:
+            raise ScreenshotError(f'Client error happened: {e}')
         finally:
-            try:
-                self.lock.release()
-            except RuntimeError:
-                pass
+            # browser is restarted after errors
+            self.pool.release(browser, failed=failed)
 
-            try:
-                await stop_session(session)
-            except UnboundLocalError:
-                pass
+        result = (opened_url, screenshot.getvalue())
+        if resolved_key != key:
+            self._results.put(resolved_key, result)
+
+        return result
 
+    async def send_screenshot(self, ctx, m, opened_url, screenshot):
         try:
             title = opened_url.split('/')[2]
         except IndexError:
@@ -159,7 +507,7 @@ class Module(ModuleBase):
         )
         e.set_image(url='attachment://screenshot.png')
 
-        f = File(screenshot, filename='screenshot.png')
+        f = File(BytesIO(screenshot), filename='screenshot.png')
         e.set_footer(
                 text=f'[{round(time.time() - (m.created_at or m.edited_at).timestamp(), 1)} sec] Note: above content is user-generated.',
             icon_url=ctx.author.avatar_url
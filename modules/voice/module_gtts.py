@@ -1,23 +1,52 @@
 from objects.modulebase import ModuleBase
 from objects.permissions import PermissionEmbedLinks
 from objects.paginators import Paginator
+from objects.lazyimport import lazy_import
+
+import re
+import os
+import asyncio
 
 from io import BytesIO
-from tempfile import TemporaryFile
-from functools import partial
 
 from discord import Embed, Colour, DMChannel, File, FFmpegPCMAudio, PCMVolumeTransformer
 
-import gtts
+from utils.voice import connect, enqueue, VoiceConnectionError
+
 
-from utils.voice import connect, play, VoiceConnectionError
+gtts = lazy_import('gtts')
 
+# google does not accept longer text, gtts splits it further if needed
+CHUNK_SIZE = 100
+MAX_PARALLEL_REQUESTS = 4
+
+SENTENCE_END_REGEX = re.compile(r'(?<=[.!?;:\n])\s+')
 
 ffmpeg_options = {
     'pipe': True,
     'options': '-v 0'
 }
 
+
+def split_text(text, size=CHUNK_SIZE):
+    """Splits text into chunks of whole sentences not longer than size if
+    possible"""
+
+    chunks = []
+    current = ''
+    for sentence in SENTENCE_END_REGEX.split(text.strip()):
+        if current and len(current) + len(sentence) + 1 > size:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f'{current} {sentence}' if current else sentence
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
 class Module(ModuleBase):
 
     usage_doc = '{prefix}{aliases} <text>'
@@ -63,7 +92,10 @@ class Module(ModuleBase):
     ratelimit = (1, 5)
 
     async def on_load(self, from_reload):
-        self.langs = gtts.lang.tts_langs()
+        self.langs = await self.bot.language_cache.get('gtts', self._fetch_languages)
+
+    async def _fetch_languages(self):
+        return await self.bot.loop.run_in_executor(None, gtts.lang.tts_langs)
 
     async def on_call(self, ctx, args, **flags):
         if args[1:].lower() == 'list':
@@ -104,31 +136,108 @@ class Module(ModuleBase):
             if language_flag not in self.langs:
                 return await ctx.warn('Language not found. Use `list` subcommand to get list of voices')
 
+        language = language_flag or 'en'
+        slow_flag = flags.get('slow', False)
+        file_flag = flags.get('file', not voice_flag)
+
+        cache_key = self.bot.audio_cache.make_key(
+            'gtts', args[1:], language, slow_flag, volume)
+
+        if voice_flag and not file_flag:
+            audio = await self.bot.loop.run_in_executor(
+                None, self.bot.audio_cache.get, cache_key)
+            if audio is not None:
+                return await enqueue(ctx, vc, audio, title=args[1:])
+
+        chunks = split_text(args[1:])
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+
+        async def synthesize(chunk):
+            async with semaphore:
+                return await self.bot.loop.run_in_executor(
+                    None, self._synthesize, chunk, language, slow_flag)
 
-        tts = gtts.gTTS(
-            args[1:], lang=language_flag or 'en',
-            slow=flags.get('slow', False), lang_check=False
-        )
+        # chunks are requested concurrently, first chunk is played as soon
+        # as it is ready
+        tasks = [self.bot.loop.create_task(synthesize(c)) for c in chunks]
 
-        with TemporaryFile() as tts_file:
-            partial_tts = partial(tts.write_to_fp, tts_file)
+        try:
+            await tasks[0]
+        except Exception:
+            for task in tasks:
+                task.cancel()
+
+            return await ctx.error('Problem with api response. Please, try again later')
+
+        if voice_flag:
+            # mp3 chunks can be concatenated, they are written to ffmpeg
+            # stdin in order
+            read_fd, write_fd = os.pipe()
+            try:
+                with open(read_fd, 'rb') as read_pipe:
+                    source = FFmpegPCMAudio(read_pipe, **ffmpeg_options)
+            except Exception:
+                os.close(write_fd)
+
+                raise
 
+            audio = self.bot.audio_cache.wrap(
+                cache_key, PCMVolumeTransformer(source, volume))
+
+            self.bot.loop.create_task(
+                self._write_chunks(
+                    tasks, open(write_fd, 'wb', buffering=0), audio, cancel=not file_flag))
+            await enqueue(ctx, vc, audio, title=args[1:])
+
+        if file_flag:
             try:
-                await self.bot.loop.run_in_executor(None, partial_tts)
+                data = b''.join(await asyncio.gather(*tasks))
             except Exception:
                 return await ctx.error('Problem with api response. Please, try again later')
 
-            tts_file.seek(0)
+            try:
+                await ctx.send(file=File(BytesIO(data), filename='tts.mp3'))
+            except Exception:
+                await ctx.warn('Failed to send file')
 
-            audio = PCMVolumeTransformer(FFmpegPCMAudio(tts_file, **ffmpeg_options), volume)
+    def _synthesize(self, text, language, slow):
+        fp = BytesIO()
+        gtts.gTTS(text, lang=language, slow=slow, lang_check=False).write_to_fp(fp)
 
-            if voice_flag:
-                play(vc, audio)
-                await ctx.react('✅')
+        return fp.getvalue()
 
-            if flags.get('file', not voice_flag):
-                try:
-                    tts_file.seek(0)
-                    await ctx.send(file=File(BytesIO(tts_file.read()), filename='tts.mp3'))
-                except Exception:
-                    await ctx.warn('Failed to send file')
+    async def _write_chunks(self, tasks, pipe, audio, cancel=True):
+        written = 0
+        writer = None
+        try:
+            # pipe is written without blocking, drain waits while it is full
+            transport, protocol = await self.bot.loop.connect_write_pipe(
+                asyncio.streams.FlowControlMixin, pipe)
+            writer = asyncio.StreamWriter(transport, protocol, None, self.bot.loop)
+
+            for task in tasks:
+                data = await task
+                writer.write(data)
+                await writer.drain()
+                written += 1
+        except Exception:
+            # audio is stopped or chunk failed, rest of text is not played
+            pass
+        finally:
+            if written < len(tasks):
+                # truncated speech is not cached, discarded before pipe is
+                # closed and ffmpeg reaches end of audio
+                audio.discard()
+                # chunks are still needed if file is sent
+                if cancel:
+                    for task in tasks:
+                        task.cancel()
+
+            try:
+                if writer is None:
+                    pipe.close()
+                else:
+                    # transport closes pipe
+                    writer.close()
+            except OSError:
+                pass
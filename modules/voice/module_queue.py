@@ -0,0 +1,89 @@
+from objects.modulebase import ModuleBase
+
+from utils.voice import get_queue
+
+
+class Module(ModuleBase):
+
+    usage_doc = '{prefix}{aliases} [subcommand]'
+    short_doc = 'Voice playback queue'
+    long_doc = (
+        'Subcommands:\n'
+        '\tskip:  skip current item\n'
+        '\tclear: remove all queued items\n'
+        '\tstats: show queue statistics\n'
+        'Skip and clear require being in bot voice channel or move members permission'
+    )
+
+    name = 'queue'
+    aliases = (name, 'voicequeue')
+    category = 'Actions'
+    max_args = 1
+    guild_only = True
+
+    async def on_call(self, ctx, args, **flags):
+        queue = get_queue(ctx.guild.id)
+        subcommand = args[1].lower() if len(args) > 1 else None
+
+        if subcommand in ('skip', 'clear') and not self._can_control(ctx):
+            return await ctx.error(
+                'You should be in my voice channel or have move members permission')
+
+        if subcommand == 'skip':
+            if queue is None or not queue.skip():
+                return await ctx.warn('Nothing is playing')
+
+            return await ctx.react('✅')
+
+        if subcommand == 'clear':
+            if queue is None or not queue.items:
+                return await ctx.warn('Queue is empty')
+
+            return await ctx.info(f'Removed **{queue.clear()}** items from queue')
+
+        if subcommand == 'stats':
+            if queue is None:
+                return await ctx.info('Nothing was played in this guild')
+
+            stats = queue.get_stats()
+
+            return (
+                f'Queued: **{stats["queued"]}** / {queue.max_depth}\n'
+                f'Played: **{stats["played"]}**\n'
+                f'Skipped: **{stats["skipped"]}**\n'
+                f'Dropped (queue full): **{stats["dropped"]}**\n'
+                f'Average wait: **{round(stats["average_wait"], 1)}** sec'
+            )
+
+        if subcommand is not None:
+            return await self.on_doc_request(ctx)
+
+        if queue is None or (queue.current is None and not queue.items):
+            return await ctx.info('Queue is empty')
+
+        lines = []
+        if queue.current is not None:
+            lines.append(f'Now playing: {self._format_title(queue.current)}')
+
+        for i, item in enumerate(queue.items):
+            lines.append(f'`{i + 1}`: {self._format_title(item)}')
+
+        return '\n'.join(lines)
+
+    def _can_control(self, ctx):
+        if ctx.author.guild_permissions.move_members:
+            return True
+
+        vc = ctx.guild.voice_client
+        if vc is None or ctx.author.voice is None:
+            return False
+
+        return ctx.author.voice.channel == vc.channel
+
+    def _format_title(self, item):
+        if item.title is None:
+            return 'Untitled'
+
+        title = item.title if len(item.title) <= 50 else item.title[:47] + '...'
+
+        return f'**{title}**'
@@ -10,11 +10,10 @@ from tempfile import TemporaryFile
 from discord import Embed, Colour, DMChannel, File, FFmpegPCMAudio, PCMVolumeTransformer
 
 from utils.funcs import create_subprocess_exec, execute_process
-from utils.voice import connect, play, VoiceConnectionError
+from utils.voice import connect, enqueue, spawn_piped_audio, VoiceConnectionError
 
 
 ffmpeg_options = {
-    'pipe': True,
     'options': '-v 0'
 }
 
@@ -219,6 +218,7 @@ class Module(ModuleBase):
 
         program = ['espeak-ng', text, '--stdout']
 
+        speed = None
         speed_flag = flags.get('speed')
         if speed_flag is not None:
             try:
@@ -252,21 +252,46 @@ class Module(ModuleBase):
 
         program.extend(('-v', language))
 
+        file_flag = flags.get('file', not voice_flag)
+
+        # voice variant is random anyway, it is not a part of key
+        cache_key = self.bot.audio_cache.make_key(
+            'espeak', text, language_flag, woman_flag, quiet_flag, speed, volume)
+
+        if voice_flag and not file_flag:
+            audio = await self.bot.loop.run_in_executor(
+                None, self.bot.audio_cache.get, cache_key)
+            if audio is not None:
+                return await enqueue(ctx, vc, audio, title=text)
+
+        if voice_flag and not file_flag:
+            # espeak output is streamed to ffmpeg, playback starts before
+            # synthesis is finished
+            process, source = await spawn_piped_audio(program, **ffmpeg_options)
+            # waited without holding executor thread for whole playback
+            self.bot.loop.create_task(process.wait())
+
+            audio = self.bot.audio_cache.wrap(
+                cache_key, PCMVolumeTransformer(source, volume))
+
+            return await enqueue(ctx, vc, audio, title=text)
+
+        # full output is needed for file
         process, pid = await create_subprocess_exec(*program)
         stdout, stderr = await execute_process(process)
 
-        with TemporaryFile() as tmp:
-            tmp.write(stdout)
-            tmp.seek(0)
-            audio = PCMVolumeTransformer(
-                FFmpegPCMAudio(tmp, **ffmpeg_options), volume)
+        if voice_flag:
+            with TemporaryFile() as tmp:
+                tmp.write(stdout)
+                tmp.seek(0)
+                audio = self.bot.audio_cache.wrap(
+                    cache_key,
+                    PCMVolumeTransformer(FFmpegPCMAudio(tmp, pipe=True, **ffmpeg_options), volume)
+                )
 
-            if flags.get('file', not voice_flag):
-                try:
-                    await ctx.send(file=File(BytesIO(stdout), filename='tts.wav'))
-                except Exception:
-                    await ctx.warn('Failed to send file')
+            await enqueue(ctx, vc, audio, title=text)
 
-        if voice_flag:
-            play(vc, audio)
-            await ctx.react('✅')
+        try:
+            await ctx.send(file=File(BytesIO(stdout), filename='tts.wav'))
+        except Exception:
+            await ctx.warn('Failed to send file')
@@ -0,0 +1,70 @@
+import os
+import threading
+
+from objects.logger import Logger
+from objects.image import PIL_INSTALLED, PIL_Image
+
+
+TEMPLATES_DIR = 'templates'
+
+logger = Logger.get_logger()
+
+
+class Assets:
+    """Template images, decoded and converted once on first use.
+
+    Images returned by get are shared between calls and threads and should
+    not be modified, use copy to get modifiable image. Loaded images are
+    only read again by reload.
+    """
+
+    def __init__(self, root=TEMPLATES_DIR):
+        self.root = root
+
+        # name: (mode, image)
+        self._images = {}
+        # images are loaded from executor threads
+        self._lock = threading.Lock()
+
+    def _load(self, name, mode):
+        if not PIL_INSTALLED:
+            raise RuntimeError('Pillow library is not installed, can not load assets')
+
+        logger.trace(f'Loading asset {name}')
+        with PIL_Image.open(os.path.join(self.root, name)) as img:
+            converted = img.convert(mode)
+
+        # old image is not closed because it can still be used in executor
+        self._images[name] = (mode, converted)
+
+        return converted
+
+    def get(self, name, mode='RGBA'):
+        """Returns shared image, loads it if needed. Blocking"""
+
+        cached = self._images.get(name)
+        if cached is not None and cached[0] == mode:
+            return cached[1]
+
+        with self._lock:
+            cached = self._images.get(name)
+            if cached is not None and cached[0] == mode:
+                return cached[1]
+
+            return self._load(name, mode)
+
+    def copy(self, name, mode='RGBA'):
+        return self.get(name, mode=mode).copy()
+
+    def reload(self):
+        with self._lock:
+            for name, (mode, _) in tuple(self._images.items()):
+                self._load(name, mode)
+
+        return len(self._images)
+
+    def __contains__(self, name):
+        return name in self._images
+
+    def __len__(self):
+        return len(self._images)
@@ -0,0 +1,160 @@
+import os
+import struct
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+from objects.logger import Logger
+
+from utils.voice import OpusFramesAudio, OpusEncodingAudio
+
+
+AUDIO_CACHE_DIR = 'cache/audio'
+
+# bytes of encoded audio kept on disk
+CACHE_SIZE = 256 * 1024 * 1024
+# longer audio is not cached
+MAX_ENTRY_SIZE = 4 * 1024 * 1024
+
+# frame length prefix
+FRAME_HEADER = struct.Struct('>H')
+
+logger = Logger.get_logger()
+
+
+class AudioCache:
+    """Synthesized speech stored as opus frames on disk.
+
+    Cached audio is played without synthesis and transcoding. Entries are
+    evicted in least recently used order when size exceeds max_size.
+    Methods doing disk io are blocking and thread safe.
+    """
+
+    def __init__(self, path=AUDIO_CACHE_DIR, max_size=CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+        # key: file size
+        self._entries = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """Returns key for synthesis parameters"""
+
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def _load_index(self):
+        self._entries = OrderedDict()
+        self._size = 0
+
+        os.makedirs(self.path, exist_ok=True)
+
+        files = []
+        for name in os.listdir(self.path):
+            if name.endswith('.tmp'):
+                # interrupted write
+                os.remove(os.path.join(self.path, name))
+                continue
+
+            stat = os.stat(os.path.join(self.path, name))
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        # oldest first
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+        logger.debug(f'Audio cache: {len(self._entries)} entries, {self._size} bytes')
+
+    def get(self, key):
+        """Returns audio source or None if key is not cached"""
+
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+
+            if key not in self._entries:
+                self.misses += 1
+
+                return None
+
+            self._entries.move_to_end(key)
+
+        filename = os.path.join(self.path, key)
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+
+            # keep lru order after restart
+            os.utime(filename)
+        except OSError:
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.misses += 1
+
+            return None
+
+        frames = []
+        offset = 0
+        while offset < len(data):
+            length, = FRAME_HEADER.unpack_from(data, offset)
+            offset += FRAME_HEADER.size
+            frames.append(data[offset:offset + length])
+            offset += length
+
+        self.hits += 1
+
+        return OpusFramesAudio(frames)
+
+    def put(self, key, frames):
+        data = b''.join(FRAME_HEADER.pack(len(f)) + f for f in frames)
+        if not data or len(data) > MAX_ENTRY_SIZE:
+            return
+
+        filename = os.path.join(self.path, key)
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+
+            # written file is not visible to get until it is renamed
+            with open(filename + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(filename + '.tmp', filename)
+
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._size += len(data)
+
+            while self._size > self.max_size:
+                old_key, size = self._entries.popitem(last=False)
+                self._size -= size
+                try:
+                    os.remove(os.path.join(self.path, old_key))
+                except OSError:
+                    pass
+
+    def wrap(self, key, source):
+        """Returns opus source storing encoded audio in cache once source is
+        fully played"""
+
+        def callback(frames):
+            try:
+                self.put(key, frames)
+            except Exception as e:
+                logger.info(f'Failed to cache audio: {e}')
+
+        return OpusEncodingAudio(source, callback, max_size=MAX_ENTRY_SIZE)
+
+    def get_stats(self):
+        return {
+            'entries': len(self._entries or ()),
+            'bytes': self._size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
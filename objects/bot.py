@@ -2,12 +2,9 @@ from objects.logger import Logger
 
 logger = Logger()
 
-from aiohttp import ClientSession
-
 import traceback
 import asyncio
 import time
-import random
 import sys
 
 import asyncpg
@@ -20,10 +17,20 @@ from objects.modulemanager import ModuleManager
 from objects.config import Config
 from objects.redisdb import RedisDB
 from objects.context import Context
+from objects.assets import Assets
+from objects.httpclient import HTTPClient
+from objects.proxymanager import ProxyManager
+from objects.translator import TranslationService
+from objects.languagecache import LanguageCache
+from objects.ocr import OCRService
+from objects.services import Services
+from objects.audiocache import AudioCache, CACHE_SIZE as AUDIO_CACHE_SIZE
+from objects.voicemanager import IdleVoiceManager, IDLE_TIMEOUT
 
 from constants import *
 
 from utils import formatters
+from utils.voice import drop_queue
 
 
 FAKE_TOKEN = 'Mzk0NzkzNTc3MTYwMzc2MzIw.XiscfQ.7ghXs19Ss8PR6brPralUM_3lUs5'
@@ -75,13 +82,28 @@ class KiwiBot(discord.AutoShardedClient):
         self.redis = RedisDB()
         logger.debug('RedisDB ................ connected')
 
+        self.assets = Assets()
+        logger.debug('Assets ................. connected')
+
+        self.http_client = HTTPClient(self.config.get('http', {}))
+        self.proxy_manager = ProxyManager(
+            self, check_interval=self.config.get('proxy_check_interval', 60))
+        self.services = Services(self)
+
+        self.translator = TranslationService(self)
+        self.language_cache = LanguageCache(self)
+        self.ocr = OCRService(self)
+        self.audio_cache = AudioCache(
+            max_size=self.config.get('audio_cache_size', AUDIO_CACHE_SIZE))
+        self.voice_manager = IdleVoiceManager(
+            self, idle_timeout=self.config.get('voice_idle_timeout', IDLE_TIMEOUT))
+
         self._default_prefix = '+'
         self._mention_prefixes = []
         self.prefixes = []
         self._guild_prefixes = {}
 
         self._last_messages = {}
-        self._leave_voice_channel_tasks = {}
 
         # currently processed commands
         self._commands_in_progress = {}
@@ -95,13 +117,10 @@ class KiwiBot(discord.AutoShardedClient):
         return time.time() - self.start_time
 
     def get_proxy(self, allow_none=False):
-        proxies = list(self.proxies.keys())
-        if allow_none:
-            proxies += [None]
-        if not proxies:
-            raise ValueError('Bot has no proxy to use')
+        return self.proxy_manager.get_proxy(allow_none=allow_none)
 
-        return random.choice(proxies)
+    def report_proxy(self, proxy, success, latency=None):
+        self.proxy_manager.report(proxy, success, latency=latency)
 
     async def init_prefixes(self):
         bot_id = self.user.id
@@ -142,6 +161,8 @@ class KiwiBot(discord.AutoShardedClient):
 
     async def on_ready(self):
         if not self.is_first_on_ready_event:
+            # voice states could change while disconnected
+            self.voice_manager.reset()
             await self.mm.init_modules()
             logger.info('Bot reconnected')
             return
@@ -152,7 +173,11 @@ class KiwiBot(discord.AutoShardedClient):
         self.owner = app_info.team.owner if app_info.team else app_info.owner
 
         self.proxies = self.config.get('proxies', {})
-        self.sess = ClientSession()
+        self.sess = self.http_client.start()
+
+        self.proxy_manager.set_proxies(self.proxies)
+        self.proxy_manager.start()
+        self.voice_manager.start()
 
         redis_port = self.config.get('redis_port', None)
         try:
@@ -171,6 +196,9 @@ class KiwiBot(discord.AutoShardedClient):
 
         await self.init_prefixes()
 
+        if self.config.get('warm_up_imports', True):
+            self.loop.create_task(self.mm.warm_up_imports())
+
         self.start_time = time.time()
         logger.info(ASCII_ART)
         logger.info(f'Logged in as {self.user} with {len(self.guilds)} guilds')
@@ -183,6 +211,10 @@ class KiwiBot(discord.AutoShardedClient):
 
     async def close(self):
         await super().close()
+        self.proxy_manager.stop()
+        self.voice_manager.stop()
+        await self.translator.close()
+        await self.http_client.close()
         logger.info('Connection closed')
 
     async def on_message(self, msg, from_edit=False):
@@ -311,42 +343,10 @@ class KiwiBot(discord.AutoShardedClient):
         await self.redis.execute('LTRIM', f'tracked_message:{msg_id}', 0, 0)
 
     async def on_voice_state_update(self, member, before, after):
-        if not member.guild.me.voice:  # voice connection doesn't exist
-            return
-
-        if member.id == self.user.id and before.channel and before.channel != after.channel:  # bot moved
-            if before.channel.id in self._leave_voice_channel_tasks:
-                self._leave_voice_channel_tasks[before.channel.id].cancel()
-                del self._leave_voice_channel_tasks[before.channel.id]
-
-                if sum(1 for m in after.channel.members if not m.bot) == 0:  # no users left in channel
-                    self._leave_voice_channel_tasks[after.channel.id] = self.loop.create_task(
-                        self._voice_disconnect_task(after.channel, member.guild.voice_client))
-
-        elif before.channel and after.channel != before.channel:  # user left or moved
-            if not member.bot:  # action by user
-                if sum(1 for m in before.channel.members if not m.bot) == 0:  # no users left in channel
-                    self._leave_voice_channel_tasks[before.channel.id] = self.loop.create_task(
-                        self._voice_disconnect_task(before.channel, member.guild.voice_client))
-
-        elif after.channel and not before.channel:  # user joined
-            if member.guild.me.voice.channel == after.channel and not member.bot:  # same channel and not bot
-                if after.channel.id in self._leave_voice_channel_tasks:
-                    self._leave_voice_channel_tasks[after.channel.id].cancel()
-                    del self._leave_voice_channel_tasks[after.channel.id]
-
-    async def _voice_disconnect_task(self, channel, vc):
-        await asyncio.sleep(15)
-        if sum(1 for m in channel.members if not m.bot) > 0:  # there are users in channel
-            return
-
-        try:
-            del self._leave_voice_channel_tasks[channel.id]
-        except KeyError:
-            pass
+        self.voice_manager.on_voice_state_update(member, before, after)
 
-        if vc.is_connected():
-            await vc.disconnect()
+        if member.id == self.user.id and after.channel is None:
+            drop_queue(member.guild.id)
 
     def _pre_process_send_fields(
         self,
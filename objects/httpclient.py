@@ -0,0 +1,161 @@
+from collections import Counter
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, TraceConfig
+
+from objects.logger import Logger
+
+
+DEFAULT_OPTIONS = {
+    'limit': 100,              # total number of simultaneous connections
+    'limit_per_host': 10,      # number of simultaneous connections to single host
+    'keepalive_timeout': 60,   # seconds to keep idle connection open
+    'dns_cache_ttl': 600,      # seconds to keep resolved addresses
+    'timeout': 60,             # default total request timeout
+    'connect_timeout': 10,     # default connection timeout
+}
+
+logger = Logger.get_logger()
+
+
+class ProxySession:
+    """Session bound to a single proxy, has own connection pool"""
+
+    __slots__ = ('proxy', 'session')
+
+    def __init__(self, session, proxy):
+        self.session = session
+        self.proxy = proxy
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('proxy', self.proxy)
+
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+
+        return self.request('HEAD', url, **kwargs)
+
+    @property
+    def closed(self):
+        return self.session.closed
+
+    async def close(self):
+        await self.session.close()
+
+
+class HTTPClient:
+    """Shared aiohttp sessions with tuned connection pools.
+
+    Requests without proxy use session property, proxied requests should use
+    get_session(proxy) to reuse connections to the same proxy.
+    """
+
+    def __init__(self, options=None):
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+
+        self.session = None
+        # proxy url: ProxySession
+        self._proxy_sessions = {}
+        # session name: Counter of events
+        self._stats = {}
+
+    def start(self):
+        if self.session is not None and not self.session.closed:
+            return self.session
+
+        self.session = self._create_session('direct')
+        logger.debug('HTTPClient ............. started')
+
+        return self.session
+
+    def _create_session(self, name):
+        connector = TCPConnector(
+            limit=self.options['limit'],
+            limit_per_host=self.options['limit_per_host'],
+            keepalive_timeout=self.options['keepalive_timeout'],
+            ttl_dns_cache=self.options['dns_cache_ttl'],
+            use_dns_cache=True,
+        )
+        timeout = ClientTimeout(
+            total=self.options['timeout'],
+            connect=self.options['connect_timeout'],
+        )
+
+        return ClientSession(
+            connector=connector, timeout=timeout,
+            trace_configs=[self._create_trace_config(name)]
+        )
+
+    def _create_trace_config(self, name):
+        stats = self._stats[name] = Counter()
+
+        def counter(event):
+            async def on_event(session, context, params):
+                stats[event] += 1
+
+            return on_event
+
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(counter('requests'))
+        trace_config.on_request_exception.append(counter('errors'))
+        trace_config.on_connection_create_end.append(counter('connections_created'))
+        trace_config.on_connection_reuseconn.append(counter('connections_reused'))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+
+        return trace_config
+
+    def get_session(self, proxy=None):
+        if proxy is None:
+            return self.session
+
+        proxy_session = self._proxy_sessions.get(proxy)
+        if proxy_session is None or proxy_session.closed:
+            proxy_session = ProxySession(self._create_session(proxy), proxy)
+            self._proxy_sessions[proxy] = proxy_session
+
+        return proxy_session
+
+    def get_stats(self):
+        """Returns list of (name, stats) pairs for every session"""
+
+        sessions = [('direct', self.session)]
+        sessions += [(p, s.session) for p, s in self._proxy_sessions.items()]
+
+        result = []
+        for name, session in sessions:
+            if session is None:
+                continue
+
+            connector = session.connector
+            stats = dict(self._stats.get(name, {}))
+            if connector is not None and not connector.closed:
+                # private connector attributes, could change between aiohttp
+                # versions
+                acquired = getattr(connector, '_acquired', ())
+                conns = getattr(connector, '_conns', {})
+                stats['in_use'] = len(acquired)
+                stats['idle'] = sum(len(c) for c in conns.values())
+                stats['hosts'] = len(conns)
+            else:
+                stats['in_use'] = stats['idle'] = stats['hosts'] = 0
+
+            result.append((name, stats))
+
+        return result
+
+    async def close(self):
+        for proxy_session in self._proxy_sessions.values():
+            await proxy_session.close()
+
+        self._proxy_sessions = {}
+
+        if self.session is not None:
+            await self.session.close()
@@ -1,19 +1,20 @@
+import time
 import warnings
 
 from io import BytesIO
 from asyncio import TimeoutError
 
+from aiohttp import ClientConnectionError, ClientHttpProxyError
 
-try:
-    import PIL
 
-    from PIL.Image import DecompressionBombWarning
+from objects.lazyimport import lazy_import, is_installed
 
-    PIL_INSTALLED = True
 
-    warnings.simplefilter('error', DecompressionBombWarning)
-except ImportError:
-    PIL_INSTALLED = False
+def _on_pil_import(module):
+    warnings.simplefilter('error', module.DecompressionBombWarning)
+
+PIL_INSTALLED = is_installed('PIL')
+PIL_Image = lazy_import('PIL.Image', on_import=_on_pil_import) if PIL_INSTALLED else None
 
 STATIC_FORMATS = ('png', 'jpg', 'jpeg', 'webp')
 DEFAULT_STATIC_FORMAT = 'png'
@@ -21,11 +22,77 @@ DEFAULT_STATIC_FORMAT = 'png'
 MAX_CONTENT_LENGTH = 7000000
 MAX_DIMENSIONS = 10000
 
+# images with more colours are considered photographic
+MAX_GRAPHIC_COLOURS = 256
+# images with more pixels are saved with fastest png compression
+FAST_PNG_PIXELS = 512 * 512
+LOSSY_QUALITY = 90
+
 class EmptyImage(Exception):
     def __str__(self):
         return 'Can\'t handle image without url or bytes'
 
 
+class EncodedImage:
+    __slots__ = ('fp', 'format', 'extension', 'size', 'encode_time')
+
+    def __init__(self, fp, fmt, size, encode_time):
+        self.fp = fp
+        self.format = fmt
+        self.extension = fmt.lower()
+        self.size = size
+        self.encode_time = encode_time
+
+    def __str__(self):
+        return f'{self.format} {round(self.size / 1024, 1)} KB encoded in {round(self.encode_time * 1000)} ms'
+
+    def __repr__(self):
+        return f'<EncodedImage format={self.format!r} size={self.size!r} encode_time={self.encode_time!r}>'
+
+
+def is_photographic(img):
+    return img.getcolors(maxcolors=MAX_GRAPHIC_COLOURS) is None
+
+
+def encode_image(img, photographic=None):
+    '''Saves Pillow image to buffer, format is picked from image content.
+
+    Graphics are saved as png, photographic images are saved as jpeg or
+    as webp if they have transparency. Pass photographic=False to always
+    get png. Returned buffer is ready for reading'''
+
+    start = time.perf_counter()
+
+    if photographic is None:
+        photographic = is_photographic(img)
+
+    # buffer is not pre-sized: output size is unknown before encoding and
+    # BytesIO growth did not show up next to encoding time (1500x1500 png)
+    fp = BytesIO()
+
+    if photographic:
+        has_alpha = img.mode in ('RGBA', 'LA') and img.getchannel('A').getextrema()[0] < 255
+        if has_alpha:
+            fmt = 'WEBP'
+            img.save(fp, format=fmt, quality=LOSSY_QUALITY, method=3)
+        elif img.mode == 'RGB':
+            fmt = 'JPEG'
+            img.save(fp, format=fmt, quality=LOSSY_QUALITY)
+        else:
+            fmt = 'JPEG'
+            with img.convert('RGB') as converted:
+                converted.save(fp, format=fmt, quality=LOSSY_QUALITY)
+    else:
+        fmt = 'PNG'
+        compress_level = 1 if img.width * img.height > FAST_PNG_PIXELS else 6
+        img.save(fp, format=fmt, compress_level=compress_level)
+
+    size = fp.tell()
+    fp.seek(0)
+
+    return EncodedImage(fp, fmt, size, time.perf_counter() - start)
+
+
 class Image:
     __slots__ = ('_ctx', 'type', 'extension', 'url', 'bytes', 'error', '_use_proxy')
 
@@ -55,12 +122,14 @@ class Image:
         if not self.url:
             raise EmptyImage
 
+        proxy = None
         try:
             proxy = self._ctx.bot.get_proxy() if self._use_proxy else None
 
-            async with self._ctx.session.get(
-                    self.url, timeout=timeout, raise_for_status=True,
-                    proxy=proxy) as r:
+            begin = time.time()
+            async with self._ctx.bot.http_client.get_session(proxy).get(
+                    self.url, timeout=timeout, raise_for_status=True) as r:
+                self._ctx.bot.report_proxy(proxy, True, time.time() - begin)
 
                 if (r.content_length or 0) > MAX_CONTENT_LENGTH:
                     self.error = f'Content is too big'
@@ -78,6 +147,9 @@ class Image:
                 self.bytes = await r.read()
                 self.extension = extension
         except (Exception, TimeoutError) as e:
+            if isinstance(e, (TimeoutError, ClientConnectionError, ClientHttpProxyError)):
+                self._ctx.bot.report_proxy(proxy, False)
+
             if raise_on_error:
                 raise
             else:
@@ -101,14 +173,14 @@ class Image:
             return
 
         try:
-            img = PIL.Image.open(BytesIO(self.bytes))
+            img = PIL_Image.open(BytesIO(self.bytes))
             if sum(img.size) > MAX_DIMENSIONS:
                 self.error = f'Image is too large {img.size} pixels'
                 img.close()
                 return
 
             return img
-        except PIL.Image.DecompressionBombError:
-            self.error = f'Failed to open image, exceeds **{PIL.Image.MAX_IMAGE_PIXELS}** pixel limit'
+        except PIL_Image.DecompressionBombError:
+            self.error = f'Failed to open image, exceeds **{PIL_Image.MAX_IMAGE_PIXELS}** pixel limit'
         except OSError as e:
             self.error = f'Failed to open image: {e}'
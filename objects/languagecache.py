@@ -0,0 +1,100 @@
+import json
+import time
+import asyncio
+import traceback
+
+from objects.logger import Logger
+
+
+# seconds before cached table is refreshed in background
+REFRESH_INTERVAL = 86400
+# seconds to keep stale table in redis in case api is down
+MAX_AGE = 86400 * 30
+
+logger = Logger.get_logger()
+
+
+class LanguageCache:
+    """Language tables fetched from remote apis, persisted in redis.
+
+    Cached table is returned immediately and refreshed in background when it
+    is older than REFRESH_INTERVAL. Returned dicts are updated in place.
+    """
+
+    def __init__(self, bot, refresh_interval=REFRESH_INTERVAL):
+        self.bot = bot
+        self.refresh_interval = refresh_interval
+
+        # name: dict
+        self._tables = {}
+        # name: timestamp of last update
+        self._updated = {}
+        # name: task
+        self._refresh_tasks = {}
+
+    async def get(self, name, fetch):
+        """Returns table by name, fetch is coroutine function returning dict"""
+
+        table = self._tables.get(name)
+        if table is None:
+            cached = await self.bot.redis.get(f'language_cache:{name}')
+            if cached is not None:
+                cached = json.loads(cached)
+                table = self._tables[name] = cached['languages']
+                self._updated[name] = cached['updated']
+
+        if table is None:
+            # concurrent calls share single fetch
+            task = self._refresh_tasks.get(name)
+            if task is None or task.done():
+                task = self._refresh_tasks[name] = self.bot.loop.create_task(
+                    self._refresh(name, fetch))
+
+            try:
+                await asyncio.shield(task)
+            except Exception:
+                self._tables.pop(name, None)
+                raise
+
+            table = self._tables[name]
+        elif time.time() - self._updated[name] > self.refresh_interval:
+            self._schedule_refresh(name, fetch)
+
+        return table
+
+    def _schedule_refresh(self, name, fetch):
+        task = self._refresh_tasks.get(name)
+        if task is not None and not task.done():
+            return
+
+        self._refresh_tasks[name] = self.bot.loop.create_task(
+            self._background_refresh(name, fetch))
+
+    async def _background_refresh(self, name, fetch):
+        try:
+            await self._refresh(name, fetch)
+        except Exception:
+            logger.info(f'Failed to refresh language table {name}, using cached')
+            logger.debug(traceback.format_exc())
+
+    async def _refresh(self, name, fetch):
+        logger.trace(f'Fetching language table {name}')
+        languages = await fetch()
+
+        table = self._tables.setdefault(name, {})
+        table.clear()
+        table.update(languages)
+
+        self._updated[name] = time.time()
+
+        await self.bot.redis.set(
+            f'language_cache:{name}',
+            json.dumps({'updated': self._updated[name], 'languages': languages}),
+            'EX', MAX_AGE
+        )
+
+    async def invalidate(self, name):
+        self._tables.pop(name, None)
+        self._updated.pop(name, None)
+
+        await self.bot.redis.delete(f'language_cache:{name}')
@@ -0,0 +1,106 @@
+import time
+import threading
+import importlib
+import importlib.util
+
+
+# module name: LazyImport
+_lazy_imports = {}
+
+
+class LazyImport:
+    """Module proxy, imports module on first attribute access.
+
+    Usage:
+        gtts = lazy_import('gtts')
+        gtts.gTTS(...)  # gtts is imported here
+    """
+
+    def __init__(self, name, on_import=None):
+        self._lazy_name = name
+        self._lazy_module = None
+        # callbacks called with module after import
+        self._lazy_on_import = [] if on_import is None else [on_import]
+        self._lazy_import_time = None
+        self._lazy_lock = threading.Lock()
+
+    def _lazy_load(self):
+        if self._lazy_module is not None:
+            return self._lazy_module
+
+        # modules can be loaded from executor by warm_up
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self._lazy_name)
+                for callback in self._lazy_on_import:
+                    callback(module)
+
+                self._lazy_import_time = time.perf_counter() - start
+                self._lazy_module = module
+
+        return self._lazy_module
+
+    def _lazy_add_callback(self, on_import):
+        with self._lazy_lock:
+            if on_import in self._lazy_on_import:
+                return
+
+            self._lazy_on_import.append(on_import)
+            if self._lazy_module is None:
+                return
+
+        # module is already imported
+        on_import(self._lazy_module)
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f'<LazyImport {self._lazy_name!r} {state}>'
+
+
+def is_installed(name):
+    """Checks if top level package of module can be imported without importing it"""
+
+    return importlib.util.find_spec(name.partition('.')[0]) is not None
+
+
+def lazy_import(name, on_import=None):
+    """Returns module proxy. ImportError is raised immediately if package is missing.
+
+    Proxy is shared by all callers with the same name, on_import callbacks
+    of every caller are called"""
+
+    lazy = _lazy_imports.get(name)
+    if lazy is not None:
+        if on_import is not None:
+            lazy._lazy_add_callback(on_import)
+
+        return lazy
+
+    if not is_installed(name):
+        raise ImportError(f'No module named {name!r}')
+
+    lazy = _lazy_imports[name] = LazyImport(name, on_import=on_import)
+
+    return lazy
+
+
+def warm_up():
+    """Imports every registered module. Blocking, should be called in executor"""
+
+    for lazy in tuple(_lazy_imports.values()):
+        try:
+            lazy._lazy_load()
+        except Exception:
+            pass
+
+
+def get_import_times():
+    """Returns list of (name, seconds or None if not imported) pairs"""
+
+    return [
+        (name, lazy._lazy_import_time) for name, lazy in _lazy_imports.items()
+    ]
@@ -27,6 +27,7 @@ class ModuleBase:
     ratelimit_type   = 'user' # type of ratelimuter (see objects/ratelimiter.py)
     ratelimit        = (1, 1) # number of allowed usage / seconds
     events           = {}     # (name: function) pairs of events module will handle
+    load_timeout     = 30     # seconds on_load is allowed to take, module is disabled on timeout
 
     def __init__(self, bot):
         self.bot = bot
@@ -61,6 +62,10 @@ class ModuleBase:
         # TODO: different output for different ratelimiter type
         return await ctx.warn(f'Please, try again in **{round(time_left / 1000, 1)}** seconds')
 
+    async def on_service_unavailable(self, ctx, e):
+        return await ctx.error(
+            f'**{e.service}** service is unavailable, please try again in **{round(e.retry_after)}** seconds')
+
     async def on_not_enough_arguments(self, ctx):
         return await self.on_doc_request(ctx)
 
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import asyncio
 import traceback
 
@@ -11,6 +12,8 @@ from objects.logger import Logger
 from objects.argparser import ArgParser
 from objects.permissions import Permission
 from objects.moduleexceptions import *
+from objects.lazyimport import warm_up, get_import_times
+from objects.services import ServiceUnavailable
 
 
 logger = Logger.get_logger()
@@ -22,6 +25,9 @@ class ModuleManager:
         self.modules = {}
         self._modules = {}
 
+        # module name: {'import': seconds, 'on_load': seconds, 'status': str}
+        self.load_report = {}
+
     async def load_modules(self, module_dirs=['modules'], strict_mode=True):
         modules_found = []
 
@@ -31,14 +37,17 @@ class ModuleManager:
                     modules_found.append(path + os.sep + f)
 
         logger.trace(f'Found {len(modules_found)} modules')
+
+        load_start = time.perf_counter()
+        self.load_report = {}
+
+        # imports are not concurrent, they block event loop anyway
+        imported = []
         for module_path in modules_found:
             module_name = module_path[module_path.rfind(os.sep) + 8:-3]
+            import_start = time.perf_counter()
             try:
                 module = await self.load_module(module_path)
-                if module is None:
-                    continue
-
-                await self.init_module(module, from_reload=False)
             except Exception:
                 capture_exception()
                 logger.info(f'Failed to load module {module_name}')
@@ -47,9 +56,105 @@ class ModuleManager:
                 if strict_mode:
                     raise
 
-                module.disabled = True
-                    
+                self.load_report[module_name] = {
+                    'import': time.perf_counter() - import_start,
+                    'on_load': 0,
+                    'status': 'import error'
+                }
+
+                continue
+
+            if module is None:
+                continue
+
+            self.load_report[module.name] = {
+                'import': time.perf_counter() - import_start,
+                'on_load': 0,
+                'status': 'ok'
+            }
+            imported.append(module)
+
+        await self._init_concurrently(imported, from_reload=False, strict_mode=strict_mode)
+
         logger.trace(f'Loaded {len(self.modules)} modules')
+        self._log_load_report(time.perf_counter() - load_start)
+
+    async def _init_concurrently(self, modules, from_reload=True, strict_mode=False):
+        """Calls on_load of modules concurrently"""
+
+        async def init(module):
+            report = self.load_report.setdefault(
+                module.name, {'import': 0, 'on_load': 0, 'status': 'ok'})
+
+            on_load_start = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    self.init_module(module, from_reload=from_reload),
+                    module.load_timeout
+                )
+            except Exception as e:
+                capture_exception()
+                if isinstance(e, asyncio.TimeoutError):
+                    report['status'] = 'timeout'
+                    logger.info(
+                        f'Failed to load module {module.name}: on_load '
+                        f'timed out after {module.load_timeout} seconds'
+                    )
+                else:
+                    report['status'] = 'error'
+                    logger.info(f'Failed to load module {module.name}')
+                    logger.info(traceback.format_exc())
+
+                if strict_mode:
+                    raise
+
+                module.disabled = True
+            finally:
+                report['on_load'] = time.perf_counter() - on_load_start
+
+        if modules:
+            await asyncio.gather(*[init(m) for m in modules])
+
+    def _log_load_report(self, total_time):
+        failed = [n for n, r in self.load_report.items() if r['status'] != 'ok']
+
+        logger.info(
+            f'Loaded {len(self.load_report) - len(failed)}/{len(self.load_report)} '
+            f'modules in {round(total_time * 1000)}ms'
+            + (f', failed: [{" ".join(failed)}]' if failed else '')
+        )
+
+        lines = [f'{"MODULE":<20} | {"IMPORT":>8} | {"ON_LOAD":>8} | STATUS']
+        for name, report in sorted(
+                self.load_report.items(),
+                key=lambda x: x[1]['import'] + x[1]['on_load'], reverse=True):
+            lines.append(
+                f'{name:<20} | {round(report["import"] * 1000, 1):>6}ms | '
+                f'{round(report["on_load"] * 1000, 1):>6}ms | {report["status"]}'
+            )
+
+        logger.debug('Module load report:\n' + '\n'.join(lines))
+        self._log_import_profile()
+
+    def _log_import_profile(self):
+        lines = [f'{"LAZY IMPORT":<20} | {"TIME":>8}']
+        for name, import_time in sorted(
+                get_import_times(), key=lambda x: x[1] or 0, reverse=True):
+            if import_time is None:
+                lines.append(f'{name:<20} | {"-":>8}')
+            else:
+                lines.append(f'{name:<20} | {round(import_time * 1000, 1):>6}ms')
+
+        logger.debug('Lazy import profile:\n' + '\n'.join(lines))
+
+    async def warm_up_imports(self):
+        """Imports lazily imported modules in executor"""
+
+        start = time.perf_counter()
+        await self.bot.loop.run_in_executor(None, warm_up)
+
+        logger.debug(f'Lazy imports warmed up in {round((time.perf_counter() - start) * 1000)}ms')
+        self._log_import_profile()
 
     async def load_module(self, module_path):
         logger.trace(f'Loading module from {module_path}')
@@ -68,8 +173,8 @@ class ModuleManager:
         return module
 
     async def init_modules(self, from_reload=True):
-        for module in self.modules.values():
-            await self.init_module(module, from_reload=from_reload)
+        await self._init_concurrently(
+            list(self.modules.values()), from_reload=from_reload)
 
     async def init_module(self, module, from_reload=True):
         logger.trace(f'Calling {module.name} on_load')
@@ -158,6 +263,8 @@ class ModuleManager:
                 command_output = await task
             except Permission as p:
                 command_output = await module.on_missing_permissions(ctx, p)
+            except ServiceUnavailable as e:
+                command_output = await module.on_service_unavailable(ctx, e)
             except asyncio.CancelledError:
                 logger.trace(f'Command {name} by {ctx.author} was cancelled')
             except Exception as e:
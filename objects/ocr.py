@@ -0,0 +1,91 @@
+import json
+import zlib
+import hashlib
+
+from objects.logger import Logger
+from objects.resultcache import ResultCache
+
+
+OCR_API_URL = 'https://api.tsu.sh/google/ocr'
+
+# bytes of compressed annotations kept in memory
+CACHE_SIZE = 32 * 1024 * 1024
+
+logger = Logger.get_logger()
+
+
+class OCRError(Exception):
+    pass
+
+
+class OCRService:
+    """Recognizes text on images using remote api.
+
+    Raw annotations are cached compressed by hash of image bytes, concurrent
+    requests for the same image share single api request.
+    """
+
+    def __init__(self, bot, cache_size=CACHE_SIZE):
+        self.bot = bot
+
+        # hash: compressed annotations, images with the same hash always
+        # have the same text
+        self._cache = ResultCache(bot, cache_size, None, sizeof=len)
+
+    async def recognize(self, image):
+        """Returns raw annotations for downloaded Image object"""
+
+        await image.ensure()
+        if image.error:
+            raise OCRError(f'Error getting image: {image.error}')
+
+        key = hashlib.sha256(image.bytes).digest()
+        compressed = await self._cache.get(key, self._request_compressed, image.url)
+
+        return json.loads(zlib.decompress(compressed))
+
+    async def _request_compressed(self, url):
+        return zlib.compress(json.dumps(await self._request(url)).encode(), 6)
+
+    async def get_text(self, image):
+        """Returns text found on image or empty string"""
+
+        text_annotations = (await self.recognize(image))['responses'][0].get('textAnnotations')
+        if not text_annotations:
+            return ''
+
+        return text_annotations[0]['description']
+
+    async def _request(self, url):
+        logger.trace(f'Requesting OCR for {url}')
+
+        # annotation requests are already coalesced by recognize
+        r = await self.bot.services.get('ocr').get(
+            OCR_API_URL,
+            params=dict(q=url, raw=1),
+            headers={'User-Agent': 'KiwiBot'},
+            coalesce=False
+        )
+        if r.status != 200:
+            if r.content_type.lower() != 'application/json':
+                # something went terribly wrong
+                raise OCRError(
+                    f'Something really bad happened with underlying OCR API: {r.status}')
+
+            try:
+                r_json = r.json()
+            except ValueError:
+                raise OCRError('Unable to process response from OCR API')
+
+            raise OCRError(
+                f'Error in underlying OCR API[{r.status}]: '
+                f'{r_json.get("message", "[MISSING]")}'
+            )
+
+        return r.json()
+
+    def get_stats(self):
+        return self._cache.get_stats()
+
+    def clear(self):
+        self._cache.clear()
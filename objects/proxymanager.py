@@ -0,0 +1,180 @@
+import time
+import random
+import asyncio
+import traceback
+
+from objects.logger import Logger
+
+
+PROXY_TEST_URL = 'https://httpbin.org'
+PROXY_TEST_TIMEOUT = 5
+
+# seconds between health checks
+CHECK_INTERVAL = 60
+# weight of new sample in moving averages
+EWMA_ALPHA = 0.3
+# proxy is ejected after this number of failures in a row
+MAX_FAILURES = 3
+# seconds before ejected proxy is checked again
+EJECT_TIME = 300
+
+logger = Logger.get_logger()
+
+
+class ProxyStats:
+    __slots__ = ('url', 'name', 'latency', 'error_rate', 'failures', 'ejected_until', 'uses')
+
+    def __init__(self, url, name):
+        self.url = url
+        self.name = name
+
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.ejected_until = 0
+        self.uses = 0
+
+    @property
+    def ejected(self):
+        return self.ejected_until > time.time()
+
+    @property
+    def weight(self):
+        # unknown latency is treated as PROXY_TEST_TIMEOUT / 2
+        latency = PROXY_TEST_TIMEOUT / 2 if self.latency is None else self.latency
+
+        return max(0.01, 1 - self.error_rate) / max(0.05, latency)
+
+    def update(self, success, latency=None):
+        self.error_rate += EWMA_ALPHA * ((0.0 if success else 1.0) - self.error_rate)
+
+        if success:
+            self.failures = 0
+            self.ejected_until = 0
+            if latency is not None:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += EWMA_ALPHA * (latency - self.latency)
+        else:
+            self.failures += 1
+            if self.failures >= MAX_FAILURES and not self.ejected:
+                self.ejected_until = time.time() + EJECT_TIME
+                logger.info(f'Proxy {self.name} ejected after {self.failures} failures')
+
+    def __repr__(self):
+        return (
+            f'<ProxyStats name={self.name!r} latency={self.latency!r} '
+            f'error_rate={self.error_rate!r} ejected={self.ejected!r}>'
+        )
+
+
+class ProxyManager:
+    """Picks proxies based on health scores.
+
+    Scores are updated by background health checks and by report calls.
+    """
+
+    def __init__(self, bot, proxies=None, check_interval=CHECK_INTERVAL):
+        self.bot = bot
+        self.check_interval = check_interval
+
+        self._proxies = {}
+        self._task = None
+
+        self.set_proxies(proxies or {})
+
+    def set_proxies(self, proxies):
+        # keep stats of existing proxies
+        self._proxies = {
+            url: self._proxies.get(url) or ProxyStats(url, name)
+            for url, name in proxies.items()
+        }
+
+    def start(self):
+        if self._task is None and self._proxies:
+            self._task = self.bot.loop.create_task(self._check_task())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_proxy(self, allow_none=False):
+        if not self._proxies:
+            if allow_none:
+                return None
+
+            raise ValueError('Bot has no proxy to use')
+
+        candidates = [p for p in self._proxies.values() if not p.ejected]
+        if not candidates:
+            if allow_none:
+                return None
+
+            # everything is ejected, use proxy that failed least recently
+            candidates = [min(self._proxies.values(), key=lambda p: p.ejected_until)]
+
+        weights = [p.weight for p in candidates]
+        if allow_none:
+            # direct connection is as good as average proxy
+            candidates.append(None)
+            weights.append(sum(weights) / len(weights))
+
+        chosen = random.choices(candidates, weights)[0]
+        if chosen is None:
+            return None
+
+        chosen.uses += 1
+
+        return chosen.url
+
+    def report(self, proxy, success, latency=None):
+        """Updates proxy score. Latency is in seconds"""
+
+        if proxy is None:
+            return
+
+        stats = self._proxies.get(proxy)
+        if stats is not None:
+            stats.update(success, latency)
+
+    def get_stats(self, proxy=None):
+        if proxy is not None:
+            return self._proxies.get(proxy)
+
+        return list(self._proxies.values())
+
+    async def check(self, proxy):
+        """Checks proxy and updates score. Returns (success, latency, comment)"""
+
+        begin = time.time()
+        try:
+            async with self.bot.http_client.get_session(proxy).head(
+                    PROXY_TEST_URL, timeout=PROXY_TEST_TIMEOUT) as r:
+                status = r.status
+        except Exception as e:
+            self.report(proxy, False)
+
+            return False, None, e.__class__.__name__
+
+        latency = time.time() - begin
+        success = status == 200
+        self.report(proxy, success, latency)
+
+        return success, latency, 'ok' if success else f'HTTP {status}'
+
+    async def check_all(self):
+        return await asyncio.gather(*[self.check(p) for p in self._proxies])
+
+    async def _check_task(self):
+        while True:
+            try:
+                await self.check_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.info('Error checking proxies')
+                logger.info(traceback.format_exc())
+
+            await asyncio.sleep(self.check_interval)
@@ -0,0 +1,169 @@
+import time
+import asyncio
+
+from collections import OrderedDict
+from functools import partial
+
+
+class SharedCalls:
+    """Runs single task for concurrent calls with the same key.
+
+    Calls run in their own tasks and callers wait for them shielded, so
+    caller being cancelled does not affect others waiting for the same
+    result.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+        # key: task
+        self._tasks = {}
+
+    def get(self, key):
+        """Returns task running for key or None"""
+
+        return self._tasks.get(key)
+
+    def start(self, key, coro):
+        task = self._tasks[key] = self.bot.loop.create_task(coro)
+        task.add_done_callback(partial(self._done, key))
+
+        return task
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+        # exception is retrieved even if every caller left
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key, coro_fn, *args, **kwargs):
+        """Returns result of coro_fn(*args, **kwargs) shared with concurrent
+        calls"""
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = self.start(key, coro_fn(*args, **kwargs))
+
+        return await asyncio.shield(task)
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+class ResultCache:
+    """LRU cache of coroutine results with expiration.
+
+    Concurrent calls with the same key share single call. Exceptions are not
+    cached. Size is number of entries or total of sizeof(result) if sizeof
+    is given. Entries never expire if ttl is None.
+    """
+
+    def __init__(self, bot, size, ttl, sizeof=None):
+        self.bot = bot
+        self.size = size
+        self.ttl = ttl
+        self.sizeof = sizeof
+
+        # key: (expiration timestamp, weight, result)
+        self._cache = OrderedDict()
+        self._weight = 0
+        self._calls = SharedCalls(bot)
+
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_get(self, key):
+        cached = self._cache.get(key)
+        if cached is None:
+            return False, None
+
+        expires_at, weight, result = cached
+        if expires_at is not None and expires_at < time.time():
+            del self._cache[key]
+            self._weight -= weight
+
+            return False, None
+
+        self._cache.move_to_end(key)
+
+        return True, result
+
+    def put(self, key, result):
+        weight = 1 if self.sizeof is None else self.sizeof(result)
+        if weight > self.size:
+            return
+
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._weight -= old[1]
+
+        expires_at = None if self.ttl is None else time.time() + self.ttl
+        self._cache[key] = (expires_at, weight, result)
+        self._weight += weight
+
+        while self._weight > self.size:
+            self._weight -= self._cache.popitem(last=False)[1][1]
+
+    def peek(self, key):
+        """Returns (found, result) pair without calling anything"""
+
+        found, result = self._cache_get(key)
+        if found:
+            self.hits += 1
+
+        return found, result
+
+    def join(self, key):
+        """Returns task computing result for key or None"""
+
+        task = self._calls.get(key)
+        if task is not None:
+            self.hits += 1
+
+        return task
+
+    def start(self, key, coro):
+        """Runs coro in task shared by key, result is cached on success"""
+
+        self.misses += 1
+
+        return self._calls.start(key, self._run(key, coro))
+
+    async def _run(self, key, coro):
+        result = await coro
+        self.put(key, result)
+
+        return result
+
+    async def get(self, key, coro_fn, *args, **kwargs):
+        """Returns cached result or result of coro_fn(*args, **kwargs)"""
+
+        found, result = self.peek(key)
+        if found:
+            return result
+
+        task = self.join(key)
+        if task is None:
+            task = self.start(key, coro_fn(*args, **kwargs))
+
+        return await asyncio.shield(task)
+
+    def get_stats(self):
+        return {
+            'entries': len(self._cache),
+            'size': self._weight,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def clear(self):
+        self._cache.clear()
+        self._weight = 0
+
+    def __len__(self):
+        return len(self._cache)
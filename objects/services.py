@@ -0,0 +1,365 @@
+import json
+import time
+import random
+import asyncio
+
+from collections import deque
+
+from aiohttp import ClientConnectionError, ClientPayloadError, ClientTimeout
+
+from objects.logger import Logger
+from objects.resultcache import SharedCalls
+
+
+DEFAULT_OPTIONS = {
+    'timeout': 15,             # total request timeout
+    'retries': 2,              # extra attempts for idempotent requests
+    'retry_delay': 0.5,        # base delay between attempts, doubled every attempt
+    'failure_threshold': 5,    # failures in a row before circuit is opened
+    'reset_timeout': 30,       # seconds before open circuit lets probe request through
+}
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# responses counted as service failures, other errors are caused by request
+FAILURE_STATUSES = (500, 502, 503, 504)
+# request errors counted as service failures
+TRANSPORT_ERRORS = (ClientConnectionError, ClientPayloadError, asyncio.TimeoutError)
+
+# number of latency samples used for percentiles
+LATENCY_SAMPLES = 100
+
+logger = Logger.get_logger()
+
+
+class ServiceUnavailable(Exception):
+    def __init__(self, service, retry_after):
+        self.service = service
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f'{self.service} is unavailable, try again in {round(self.retry_after)}s'
+
+
+class ServiceResponse:
+    """Response with body read, can be shared between callers"""
+
+    __slots__ = ('status', 'content_type', 'headers', 'url', 'body')
+
+    def __init__(self, status, content_type, headers, url, body):
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers
+        self.url = url
+        self.body = body
+
+    def text(self, encoding='utf8'):
+        return self.body.decode(encoding, errors='replace')
+
+    def json(self):
+        """Parses body ignoring content type. Raises ValueError"""
+
+        return json.loads(self.body)
+
+    def __repr__(self):
+        return f'<ServiceResponse status={self.status!r} url={self.url!r} size={len(self.body)}>'
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+
+        return self.OPEN
+
+    @property
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+
+        return max(0, self.opened_at + self.reset_timeout - time.time())
+
+    def acquire(self, service):
+        """Raises ServiceUnavailable if request should not be made"""
+
+        state = self.state
+        if state == self.CLOSED:
+            return
+
+        # single probe request is let through in half-open state
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+
+        raise ServiceUnavailable(service, self.retry_after or self.reset_timeout)
+
+    def release(self):
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.time()
+
+        self._probing = False
+
+
+class ExternalService:
+    """Client for single external api.
+
+    Concurrent idempotent requests with the same arguments share single
+    request, requests with random responses should pass coalesce=False.
+    After failure_threshold failures in a row requests fail immediately with
+    ServiceUnavailable until probe request succeeds. Only 5xx server errors
+    and transport errors are failures. Failures of requests made through proxy
+    are counted separately and do not open circuit, they are usually caused
+    by proxy.
+    """
+
+    def __init__(self, bot, name, options=None):
+        self.bot = bot
+        self.name = name
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+
+        self.breaker = CircuitBreaker(
+            self.options['failure_threshold'], self.options['reset_timeout'])
+
+        # requests with the same key
+        self._calls = SharedCalls(bot)
+
+        self.requests = 0
+        self.failures = 0
+        self.proxy_failures = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.retries = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+
+        return self.request('HEAD', url, **kwargs)
+
+    async def request(
+            self, method, url, *, proxy=None, idempotent=None, coalesce=None,
+            timeout=None, retries=None, **kwargs):
+        """Returns ServiceResponse. Responses with 5xx status are returned
+        after all retries fail.
+
+        Only idempotent requests are retried and coalesced by default.
+        timeout and retries override service options for this request"""
+
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        if coalesce is None:
+            coalesce = idempotent
+        if timeout is None:
+            timeout = self.options['timeout']
+        if retries is None:
+            retries = self.options['retries']
+
+        attempts = 1 + retries if idempotent else 1
+
+        if not coalesce:
+            return await self._request_with_retries(
+                method, url, proxy, timeout, attempts, kwargs)
+
+        key = (
+            method, str(url), proxy, timeout, attempts,
+            repr(sorted(kwargs.items(), key=lambda x: x[0]))
+        )
+
+        if key in self._calls:
+            self.coalesced += 1
+
+        return await self._calls.run(
+            key, self._request_with_retries, method, url, proxy, timeout, attempts, kwargs)
+
+    async def _request_with_retries(self, method, url, proxy, timeout, attempts, kwargs):
+
+        for attempt in range(attempts):
+            if attempt:
+                self.retries += 1
+                # jitter avoids synchronized retries from multiple commands
+                await asyncio.sleep(
+                    self.options['retry_delay'] * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+            result = await self._request_once(method, url, proxy, timeout, kwargs)
+            if isinstance(result, ServiceResponse) and result.status < 500:
+                return result
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    async def _request_once(self, method, url, proxy, timeout, kwargs):
+        """Returns response or exception to retry with"""
+
+        try:
+            self.breaker.acquire(self.name)
+        except ServiceUnavailable:
+            self.rejected += 1
+            raise
+
+        self.requests += 1
+
+        session = self.bot.http_client.get_session(proxy)
+
+        start = time.perf_counter()
+        try:
+            async with session.request(
+                    method, url, timeout=ClientTimeout(total=timeout), **kwargs) as r:
+                response = ServiceResponse(
+                    r.status, r.content_type, r.headers, r.url, await r.read())
+        except TRANSPORT_ERRORS as e:
+            self._record_failure(proxy)
+
+            return e
+        except asyncio.CancelledError:
+            self.breaker.release()
+
+            raise
+        except Exception:
+            # invalid url and other errors caused by request itself are not
+            # failures of service, but probe has to be finished
+            self.breaker.release()
+
+            raise
+
+        self._latencies.append(time.perf_counter() - start)
+
+        if response.status in FAILURE_STATUSES:
+            self._record_failure(proxy)
+        else:
+            self._record_success()
+
+        return response
+
+    async def run(self, coro_fn, *args, **kwargs):
+        """Calls coroutine function with circuit breaker and timeout applied.
+        Can be used for libraries making requests on their own"""
+
+        try:
+            self.breaker.acquire(self.name)
+        except ServiceUnavailable:
+            self.rejected += 1
+            raise
+
+        self.requests += 1
+
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                coro_fn(*args, **kwargs), self.options['timeout'])
+        except asyncio.CancelledError:
+            self.breaker.release()
+
+            raise
+        except Exception:
+            self._record_failure()
+
+            raise
+
+        self._latencies.append(time.perf_counter() - start)
+        self._record_success()
+
+        return result
+
+    def _record_success(self):
+        if self.breaker.opened_at is not None:
+            logger.info(f'Service {self.name} recovered')
+
+        self.breaker.record_success()
+
+    def _record_failure(self, proxy=None):
+        if proxy is not None:
+            self.proxy_failures += 1
+            # probe result is unknown, next request probes again
+            self.breaker.release()
+
+            return
+
+        self.failures += 1
+
+        was_open = self.breaker.opened_at is not None
+        self.breaker.record_failure()
+        if not was_open and self.breaker.opened_at is not None:
+            logger.info(
+                f'Service {self.name} failed {self.breaker.failures} times in a row, '
+                f'failing requests for {self.breaker.reset_timeout}s'
+            )
+
+    def get_stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            'state': self.breaker.state,
+            'requests': self.requests,
+            'failures': self.failures,
+            'proxy_failures': self.proxy_failures,
+            'rejected': self.rejected,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+        }
+
+
+class Services:
+    """Registry of external services, options are read from services config
+    section by service name"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+        # name: ExternalService
+        self._services = {}
+
+    def get(self, name):
+        service = self._services.get(name)
+        if service is None:
+            options = self.bot.config.get('services', {}).get(name, {})
+            service = self._services[name] = ExternalService(self.bot, name, options)
+
+        return service
+
+    def get_stats(self):
+        """Returns list of (name, stats) pairs for every service"""
+
+        return [(name, s.get_stats()) for name, s in sorted(self._services.items())]
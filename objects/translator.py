@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+
+from objects.logger import Logger
+from objects.resultcache import ResultCache
+from objects.lazyimport import lazy_import, is_installed
+
+
+GOOGLETRANS_INSTALLED = is_installed('aiogoogletrans')
+if GOOGLETRANS_INSTALLED:
+    gt = lazy_import('aiogoogletrans')
+
+YANDEX_API_URL = 'https://translate.yandex.net/api/v1.5/tr.json/'
+
+GOOGLE_SERVICE_URLS = [
+    'translate.google.com', 'translate.google.co.kr',
+    'translate.google.at', 'translate.google.de',
+    'translate.google.ru', 'translate.google.ch',
+    'translate.google.fr', 'translate.google.es'
+]
+
+PROVIDERS = ('yandex', 'google')
+
+CACHE_SIZE = 5000
+CACHE_TTL = 86400
+
+logger = Logger.get_logger()
+
+
+class TranslationError(Exception):
+    pass
+
+
+class Translation:
+    __slots__ = ('text', 'src', 'dest')
+
+    def __init__(self, text, src, dest):
+        self.text = text
+        self.src = src
+        self.dest = dest
+
+    def __repr__(self):
+        return f'<Translation src={self.src!r} dest={self.dest!r} text={self.text!r}>'
+
+
+class TranslationService:
+    """Translates text using remote apis.
+
+    Results are cached, concurrent requests for the same text share single
+    api request.
+    """
+
+    def __init__(self, bot, cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL):
+        self.bot = bot
+
+        # key: Translation
+        self._cache = ResultCache(bot, cache_size, cache_ttl)
+
+        self._google = None
+
+    @staticmethod
+    def _get_key(text, src, dest, provider):
+        return (
+            hashlib.sha1(text.encode()).digest(), src or 'auto', dest, provider
+        )
+
+    async def get_languages(self, provider='yandex'):
+        """Returns dict of language codes and names supported by provider"""
+
+        if provider == 'yandex':
+            return await self.bot.language_cache.get(
+                'yandex', self._fetch_yandex_languages)
+        elif provider == 'google':
+            if not GOOGLETRANS_INSTALLED:
+                raise TranslationError(
+                    'aiogoogletrans python library is required to use google translator')
+
+            return gt.LANGUAGES
+
+        raise ValueError(f'Unknown translation provider: {provider}')
+
+    async def _fetch_yandex_languages(self):
+        api_key = self.bot.config.get('yandex_api_key')
+        if not api_key:
+            raise TranslationError('No yandex api key in config')
+
+        params = {
+            'key': api_key,
+            'ui': 'en'
+        }
+
+        r = await self.bot.services.get('yandex_translate').get(
+            YANDEX_API_URL + 'getLangs', params=params)
+        if r.status != 200:
+            raise TranslationError(f'Failed to fetch languages: {r.status}')
+
+        return r.json()['langs']
+
+    async def translate(self, text, dest, src=None, provider='yandex'):
+        return (await self.translate_many([text], dest, src=src, provider=provider))[0]
+
+    async def translate_many(self, texts, dest, src=None, provider='yandex'):
+        """Translates list of texts, uses bulk requests if provider supports them"""
+
+        if provider not in PROVIDERS:
+            raise ValueError(f'Unknown translation provider: {provider}')
+
+        keys = [self._get_key(t, src, dest, provider) for t in texts]
+
+        resolved = {}
+        # key: task of request made by this or other call
+        tasks = {}
+        # key: text of requests this call is responsible for
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key in resolved or key in tasks or key in missing:
+                continue
+
+            found, translation = self._cache.peek(key)
+            if found:
+                resolved[key] = translation
+                continue
+
+            task = self._cache.join(key)
+            if task is None:
+                missing[key] = text
+            else:
+                tasks[key] = task
+
+        if missing:
+            # single request for all missing texts, every text is cached
+            # by its own task
+            batch = self.bot.loop.create_task(
+                self._request(list(missing.values()), dest, src, provider))
+            for i, key in enumerate(missing):
+                tasks[key] = self._cache.start(key, self._get_translation(batch, i))
+
+        for key, task in tasks.items():
+            resolved[key] = await asyncio.shield(task)
+
+        return [resolved[key] for key in keys]
+
+    @staticmethod
+    async def _get_translation(batch, index):
+        return (await batch)[index]
+
+    async def _request(self, texts, dest, src, provider):
+        if provider == 'yandex':
+            return await self._request_yandex(texts, dest, src)
+
+        return await asyncio.gather(
+            *[self._request_google(t, dest, src) for t in texts])
+
+    async def _request_yandex(self, texts, dest, src):
+        api_key = self.bot.config.get('yandex_api_key')
+        if not api_key:
+            raise TranslationError('No yandex api key in config')
+
+        params = {
+            'key': api_key,
+            'lang': dest if src is None else f'{src}-{dest}'
+        }
+        # multiple text fields are translated in the same order
+        data = [('text', t) for t in texts]
+
+        # requests are already coalesced by translate_many
+        r = await self.bot.services.get('yandex_translate').post(
+            YANDEX_API_URL + 'translate', params=params, data=data,
+            idempotent=True, coalesce=False
+        )
+        if r.status != 200:
+            raise TranslationError(f'[HTTP {r.status}] Error')
+
+        r_json = r.json()
+
+        if len(r_json['text']) != len(texts):
+            raise TranslationError('Wrong number of translations returned')
+
+        source, _, destination = r_json['lang'].partition('-')
+
+        return [Translation(t, source, destination) for t in r_json['text']]
+
+    async def _request_google(self, text, dest, src):
+        if not GOOGLETRANS_INSTALLED:
+            raise TranslationError(
+                'aiogoogletrans python library is required to use google translator')
+
+        if self._google is None:
+            self._google = gt.Translator(service_urls=GOOGLE_SERVICE_URLS)
+
+        translation = await self.bot.services.get('google_translate').run(
+            self._google.translate, text, src=src or 'auto', dest=dest,
+            proxy=self.bot.get_proxy(allow_none=True)
+        )
+
+        return Translation(translation.text, translation.src, dest)
+
+    def get_stats(self):
+        return self._cache.get_stats()
+
+    def clear(self):
+        self._cache.clear()
+
+    async def close(self):
+        if self._google is not None:
+            await self._google.close()
+            self._google = None
@@ -0,0 +1,153 @@
+import time
+import heapq
+import asyncio
+import traceback
+
+from objects.logger import Logger
+
+
+# seconds before bot leaves voice channel without users
+IDLE_TIMEOUT = 15
+
+logger = Logger.get_logger()
+
+
+class IdleVoiceManager:
+    """Disconnects from voice channels without users.
+
+    Number of users in channels is updated from voice state events, idle
+    connections are closed by single timer task.
+    """
+
+    def __init__(self, bot, idle_timeout=IDLE_TIMEOUT):
+        self.bot = bot
+        self.idle_timeout = idle_timeout
+
+        # channel id: number of non-bot members
+        self._humans = {}
+        # guild id: deadline
+        self._deadlines = {}
+        # (deadline, guild id), can contain cancelled deadlines
+        self._heap = []
+
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = self.bot.loop.create_task(self._timer_task())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        """Drops member counts and checks connected channels again"""
+
+        self._humans = {}
+        for vc in self.bot.voice_clients:
+            self._check_guild(vc.guild)
+
+    def _count_humans(self, channel):
+        count = self._humans.get(channel.id)
+        if count is None:
+            count = self._humans[channel.id] = sum(
+                1 for m in channel.members if not m.bot)
+
+        return count
+
+    def _update_count(self, channel, delta):
+        # unknown channels are counted from members when needed, members are
+        # already updated at this point
+        if channel is not None and channel.id in self._humans:
+            self._humans[channel.id] += delta
+
+    def on_voice_state_update(self, member, before, after):
+        if before.channel == after.channel:
+            # mute, deafen and other changes
+            return
+
+        if not member.bot:
+            self._update_count(before.channel, -1)
+            self._update_count(after.channel, 1)
+
+        self._check_guild(member.guild)
+
+    def _check_guild(self, guild):
+        voice = guild.me.voice if guild.me is not None else None
+        if voice is None or voice.channel is None:
+            return self._cancel(guild.id)
+
+        if self._count_humans(voice.channel):
+            self._cancel(guild.id)
+        else:
+            self._schedule(guild.id)
+
+    def _schedule(self, guild_id):
+        if guild_id in self._deadlines:
+            return
+
+        deadline = time.monotonic() + self.idle_timeout
+        self._deadlines[guild_id] = deadline
+        heapq.heappush(self._heap, (deadline, guild_id))
+
+        if self._heap[0][1] == guild_id:
+            # timer sleeps until later deadline
+            self._wakeup.set()
+
+    def _cancel(self, guild_id):
+        if self._deadlines.pop(guild_id, None) is None:
+            return
+
+        # cancelled deadlines are skipped by timer, heap is rebuilt when they
+        # take most of it
+        if len(self._heap) > 2 * len(self._deadlines) + 16:
+            self._heap = [(d, g) for g, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    async def _timer_task(self):
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, guild_id = heapq.heappop(self._heap)
+                if self._deadlines.get(guild_id) != deadline:
+                    continue
+
+                del self._deadlines[guild_id]
+                self.bot.loop.create_task(self._disconnect(guild_id))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _disconnect(self, guild_id):
+        guild = self.bot.get_guild(guild_id)
+        if guild is None or guild.voice_client is None:
+            return
+
+        vc = guild.voice_client
+        if not vc.is_connected():
+            return
+
+        # counters could be wrong after missed events, recount from members
+        self._humans.pop(vc.channel.id, None)
+        if self._count_humans(vc.channel):
+            return
+
+        try:
+            await vc.disconnect()
+        except Exception:
+            logger.info(f'Failed to leave voice channel in guild {guild_id}')
+            logger.debug(traceback.format_exc())
+
+    def get_stats(self):
+        return {
+            'channels': len(self._humans),
+            'scheduled': len(self._deadlines),
+            'heap': len(self._heap),
+        }
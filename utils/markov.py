@@ -0,0 +1,428 @@
+import random
+import base64
+
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+
+# weight of message halves after this number of newer messages
+HALF_LIFE = 1000
+DECAY = 2 ** (1 / HALF_LIFE)
+
+# transitions weaker than this fraction of new message weight are dropped
+MIN_WEIGHT = 1 / 64
+# transitions kept in single model
+MAX_TRANSITIONS = 50000
+# states with more successors get dict index for lookups
+INDEX_THRESHOLD = 32
+
+SNAPSHOT_VERSION = 3
+
+# reserved tokens, split words are never empty and have no whitespace
+BEGIN, END = 0, 1
+BEGIN_WORD, END_WORD = '', '\n'
+
+
+class MarkovModel:
+    """Word transition model of given order updated message by message.
+
+    Words are interned as integer ids. Each state (lowercased ids of order
+    previous words) maps to pair of arrays with successor ids and weights,
+    sampling uses cumulative weights built on demand. Messages are padded
+    with BEGIN and END tokens, generation restarts at the end of message.
+
+    Older messages are aged out by decaying weights: instead of multiplying
+    every weight on each message, weight of new messages grows by DECAY and
+    all weights are rescaled when it gets too large. Weak transitions and
+    unused words are pruned when model grows above MAX_TRANSITIONS.
+    """
+
+    def __init__(self, order=1):
+        self.order = order
+
+        self.tokens = []
+        self._token_ids = {}
+        # token id: lowercased token id
+        self._lower = array('I')
+        # lowercased token id: decayed number of uses
+        self._word_weights = array('d')
+        self._total_weight = 0.0
+        self._best_word = None
+
+        # state: (successor ids, weights)
+        self.transitions = {}
+        # state: {successor id: position}, only for large states
+        self._indexes = {}
+        # state: cumulative weights, dropped when state changes
+        self._cumulative = {}
+
+        self.messages = 0
+        self.words = 0
+        # oldest message seen live, history before it is not counted
+        self.first_message_id = None
+        self.bootstrapped = False
+
+        self._increment = 1.0
+        self._size = 0
+        self._compacted_tokens = 0
+
+        self._intern(BEGIN_WORD)
+        self._intern(END_WORD)
+
+    def _intern(self, word):
+        token = self._token_ids.get(word)
+        if token is None:
+            lower = word.lower()
+            lower_token = self._intern(lower) if lower != word else None
+
+            token = len(self.tokens)
+            self.tokens.append(word)
+            self._token_ids[word] = token
+            self._lower.append(token if lower_token is None else lower_token)
+            self._word_weights.append(0.0)
+
+        return token
+
+    def _state(self, context):
+        return context[-1] if self.order == 1 else tuple(context)
+
+    def add_message(self, text, age=0):
+        """Adds message text, age is number of newer messages already
+        added"""
+
+        words = text.split()
+        if not words:
+            return
+
+        weight = self._increment / DECAY ** age
+
+        context = [BEGIN] * self.order
+        for token in [self._intern(w) for w in words] + [END]:
+            self._add_transition(self._state(context), token, weight)
+
+            lower = self._lower[token]
+            context = context[1:] + [lower]
+
+            if token != END:
+                self._add_word_weight(lower, weight)
+
+        self.messages += 1
+        self.words += len(words)
+
+        if not age:
+            self._increment *= DECAY
+            if self._increment > 1e6:
+                self._rescale()
+
+        if self._size > MAX_TRANSITIONS:
+            self._prune()
+
+    def _add_transition(self, state, token, weight):
+        entry = self.transitions.get(state)
+        if entry is None:
+            self.transitions[state] = (array('I', (token, )), array('d', (weight, )))
+            self._size += 1
+
+            return
+
+        ids, weights = entry
+        index = self._indexes.get(state)
+        if index is not None:
+            position = index.get(token)
+        elif token in ids:
+            position = ids.index(token)
+        else:
+            position = None
+
+        if position is None:
+            ids.append(token)
+            weights.append(weight)
+            self._size += 1
+
+            if index is not None:
+                index[token] = len(ids) - 1
+            elif len(ids) > INDEX_THRESHOLD:
+                self._indexes[state] = {t: i for i, t in enumerate(ids)}
+        else:
+            weights[position] += weight
+
+        self._cumulative.pop(state, None)
+
+    def _add_word_weight(self, token, weight):
+        self._word_weights[token] += weight
+        self._total_weight += weight
+
+        if self._best_word is None or self._word_weights[token] > self._word_weights[self._best_word]:
+            self._best_word = token
+
+    def _rescale(self):
+        scale = 1 / self._increment
+        for _, weights in self.transitions.values():
+            for i in range(len(weights)):
+                weights[i] *= scale
+        for i in range(len(self._word_weights)):
+            self._word_weights[i] *= scale
+
+        self._total_weight *= scale
+        self._increment = 1.0
+        self._cumulative = {}
+
+    def _prune(self):
+        threshold = self._increment * MIN_WEIGHT
+
+        # recent messages alone can exceed limit, weakest of them are dropped
+        target = MAX_TRANSITIONS // 2
+        if self._size > target:
+            weights = array('d')
+            for _, state_weights in self.transitions.values():
+                weights.fromlist(state_weights.tolist())
+            threshold = max(threshold, sorted(weights)[-target])
+
+        self._drop_below(threshold)
+
+        # unused words are dropped once vocabulary doubles since last time
+        if len(self.tokens) > 2 * self._compacted_tokens:
+            self._compact_tokens()
+            self._compacted_tokens = len(self.tokens)
+
+        self._build_indexes()
+        self._cumulative = {}
+
+    def _build_indexes(self):
+        self._indexes = {
+            state: {t: i for i, t in enumerate(ids)}
+            for state, (ids, _) in self.transitions.items()
+            if len(ids) > INDEX_THRESHOLD
+        }
+
+    def _drop_below(self, threshold):
+        for state in list(self.transitions):
+            ids, weights = self.transitions[state]
+            if min(weights) >= threshold:
+                continue
+
+            keep = [i for i, w in enumerate(weights) if w >= threshold]
+            self._size -= len(ids) - len(keep)
+            if keep:
+                self.transitions[state] = (
+                    array('I', (ids[i] for i in keep)),
+                    array('d', (weights[i] for i in keep))
+                )
+            else:
+                del self.transitions[state]
+
+    def _compact_tokens(self):
+        """Drops words not used by any transition and renumbers the rest"""
+
+        used = {BEGIN, END}
+        for state, (ids, _) in self.transitions.items():
+            used.update(ids)
+            used.update((state, ) if self.order == 1 else state)
+        used.update([self._lower[t] for t in used])
+
+        if len(used) == len(self.tokens):
+            return
+
+        mapping = {}
+        tokens, lower, word_weights = [], array('I'), array('d')
+        for old in sorted(used):
+            mapping[old] = len(tokens)
+            tokens.append(self.tokens[old])
+            word_weights.append(self._word_weights[old])
+        for old in sorted(used):
+            lower.append(mapping[self._lower[old]])
+
+        def remap_state(state):
+            if self.order == 1:
+                return mapping[state]
+
+            return tuple(mapping[t] for t in state)
+
+        self.transitions = {
+            remap_state(state): (array('I', (mapping[t] for t in ids)), weights)
+            for state, (ids, weights) in self.transitions.items()
+        }
+
+        self.tokens = tokens
+        self._token_ids = {w: i for i, w in enumerate(tokens)}
+        self._lower = lower
+        self._word_weights = word_weights
+        self._total_weight = sum(word_weights)
+        self._best_word = max(
+            range(len(word_weights)), key=word_weights.__getitem__, default=None)
+
+    def _sample(self, state):
+        entry = self.transitions.get(state)
+        if entry is None:
+            return None
+
+        ids, weights = entry
+        cumulative = self._cumulative.get(state)
+        if cumulative is None:
+            cumulative = self._cumulative[state] = array('d', accumulate(weights))
+
+        index = bisect_right(cumulative, random.random() * cumulative[-1])
+
+        return ids[min(index, len(ids) - 1)]
+
+    def generate(self, num_words):
+        chain = []
+        context = [BEGIN] * self.order
+        # pruned states end chain early instead of looping
+        for _ in range(num_words * 4):
+            if len(chain) >= num_words:
+                break
+
+            token = self._sample(self._state(context))
+            if token is None or token == END:
+                if context[-1] == BEGIN:
+                    break
+
+                # end of message, start new one
+                context = [BEGIN] * self.order
+                continue
+
+            chain.append(self.tokens[token])
+            context = context[1:] + [self._lower[token]]
+
+        return chain
+
+    def most_frequent_word(self):
+        """Returns (word, fraction of words) pair"""
+
+        if self._best_word is None or not self._total_weight:
+            return None, 0
+
+        return (
+            self.tokens[self._best_word],
+            self._word_weights[self._best_word] / self._total_weight
+        )
+
+    def to_dict(self):
+        """Returns snapshot, arrays are stored as base64 encoded bytes.
+        Weights are saved as is with current increment, model is not
+        changed."""
+
+        states, counts, ids, weights = array('I'), array('I'), array('I'), array('d')
+        for state, (state_ids, state_weights) in self.transitions.items():
+            if self.order == 1:
+                states.append(state)
+            else:
+                states.extend(state)
+            counts.append(len(state_ids))
+            ids.extend(state_ids)
+            weights.extend(state_weights)
+
+        return {
+            'version': SNAPSHOT_VERSION,
+            'order': self.order,
+            'tokens': self.tokens,
+            'lower': _pack(self._lower),
+            'word_weights': _pack(array('f', self._word_weights)),
+            'states': _pack(states),
+            'counts': _pack(counts),
+            'ids': _pack(ids),
+            'weights': _pack(array('f', weights)),
+            'increment': self._increment,
+            'messages': self.messages,
+            'words': self.words,
+            'first_message_id': self.first_message_id,
+            'bootstrapped': self.bootstrapped
+        }
+
+    @classmethod
+    def from_dict(cls, snapshot, order=1):
+        """Returns model from snapshot or None if snapshot is outdated or has
+        different order"""
+
+        if snapshot.get('version') != SNAPSHOT_VERSION or snapshot['order'] != order:
+            return None
+
+        model = cls(order)
+        model.tokens = snapshot['tokens']
+        model._token_ids = {w: i for i, w in enumerate(model.tokens)}
+        model._lower = _unpack('I', snapshot['lower'])
+        model._word_weights = array('d', _unpack('f', snapshot['word_weights']))
+        model._total_weight = sum(model._word_weights)
+        model._best_word = max(
+            range(len(model._word_weights)),
+            key=model._word_weights.__getitem__, default=None
+        )
+
+        states = _unpack('I', snapshot['states'])
+        ids = _unpack('I', snapshot['ids'])
+        weights = _unpack('f', snapshot['weights'])
+        offset = 0
+        for i, count in enumerate(_unpack('I', snapshot['counts'])):
+            if order == 1:
+                state = states[i]
+            else:
+                state = tuple(states[i * order:(i + 1) * order])
+
+            model.transitions[state] = (
+                ids[offset:offset + count],
+                array('d', weights[offset:offset + count])
+            )
+            offset += count
+
+        model._size = offset
+        # older snapshots were rescaled before saving
+        model._increment = snapshot.get('increment', 1.0)
+        model._compacted_tokens = len(model.tokens)
+        model._build_indexes()
+        model.messages = snapshot['messages']
+        model.words = snapshot['words']
+        model.first_message_id = snapshot['first_message_id']
+        model.bootstrapped = snapshot['bootstrapped']
+
+        return model
+
+    def add_model(self, model):
+        """Adds transitions of model with same order.
+
+        Weights are normalized so that latest message of every added model
+        has the same weight.
+        """
+
+        scale = self._increment / model._increment
+        mapping = array('I', [self._intern(w) for w in model.tokens])
+
+        for state, (ids, weights) in model.transitions.items():
+            if self.order == 1:
+                state = mapping[state]
+            else:
+                state = tuple(mapping[t] for t in state)
+
+            for token, weight in zip(ids, weights):
+                self._add_transition(state, mapping[token], weight * scale)
+
+        for token, weight in enumerate(model._word_weights):
+            if weight:
+                self._add_word_weight(mapping[token], weight * scale)
+
+        self.messages += model.messages
+        self.words += model.words
+
+    @classmethod
+    def merge(cls, models):
+        """Returns model combining models with same order"""
+
+        merged = cls(models[0].order)
+        for model in models:
+            merged.add_model(model)
+
+        merged.bootstrapped = True
+
+        return merged
+
+
+def _pack(values):
+    return base64.b64encode(values.tobytes()).decode()
+
+
+def _unpack(typecode, data):
+    values = array(typecode)
+    values.frombytes(base64.b64decode(data))
+
+    return values
@@ -1,7 +1,38 @@
+import os
+import time
+import asyncio
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from discord import AudioSource, FFmpegPCMAudio
+from discord.opus import Encoder
+
+
+MAX_QUEUE_DEPTH = 10
+# threads encoding queued audio, separate from default executor
+ENCODE_THREADS = 4
+
+# guild id: PlaybackQueue
+_queues = {}
+
+_encode_executor = ThreadPoolExecutor(
+    max_workers=ENCODE_THREADS, thread_name_prefix='voice-encode')
+
+
 class VoiceConnectionError(Exception):
     pass
 
 
+class QueueFull(Exception):
+    def __init__(self, max_depth):
+        self.max_depth = max_depth
+
+    def __str__(self):
+        return f'Voice queue is full ({self.max_depth} items), try again later'
+
+
 async def connect(ctx):
     if ctx.guild is None:
         raise VoiceConnectionError('Please, use this in a guild channel')
@@ -28,8 +59,341 @@ async def connect(ctx):
 
     return ctx.guild.voice_client
 
-def play(vc, audio):
-    if vc.is_playing():
-        vc.stop()
+async def spawn_piped_audio(args, **ffmpeg_options):
+    """Starts process and returns (process, audio source) pair. Audio source
+    reads process stdout through pipe, process should be waited by caller"""
+
+    read_fd, write_fd = os.pipe()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=write_fd, stderr=asyncio.subprocess.DEVNULL)
+    except Exception:
+        os.close(read_fd)
+
+        raise
+    finally:
+        # process has own copy of pipe
+        os.close(write_fd)
+
+    try:
+        # ffmpeg has own copy of pipe too
+        with open(read_fd, 'rb') as read_pipe:
+            audio = FFmpegPCMAudio(read_pipe, pipe=True, **ffmpeg_options)
+    except Exception:
+        process.kill()
+        await process.wait()
+
+        raise
+
+    return process, audio
+
+def play(vc, audio, title=None, max_depth=MAX_QUEUE_DEPTH):
+    """Plays audio or adds it to guild queue. Returns position in queue, 0
+    if audio is played immediately. Raises QueueFull"""
+
+    queue = _queues.get(vc.guild.id)
+    if queue is None:
+        queue = _queues[vc.guild.id] = PlaybackQueue(vc)
+
+    # voice client changes after reconnect
+    queue.vc = vc
+    queue.max_depth = max_depth
+
+    return queue.add(audio, title)
+
+async def enqueue(ctx, vc, audio, title=None):
+    """Plays audio or adds it to guild queue, responds with queue position"""
+
+    try:
+        position = play(
+            vc, audio, title=title,
+            max_depth=ctx.bot.config.get('voice_queue_size', MAX_QUEUE_DEPTH)
+        )
+    except QueueFull as e:
+        return await ctx.warn(str(e))
+
+    if position:
+        await ctx.info(f'Added to voice queue, position: **{position}**')
+    else:
+        await ctx.react('✅')
+
+def get_queue(guild_id):
+    return _queues.get(guild_id)
+
+def drop_queue(guild_id):
+    """Removes guild queue, called when bot leaves voice channel"""
+
+    queue = _queues.pop(guild_id, None)
+    if queue is not None:
+        queue.clear()
+
+
+class QueueItem:
+    __slots__ = ('audio', 'title', 'queued_at')
+
+    def __init__(self, audio, title):
+        self.audio = audio
+        self.title = title
+        self.queued_at = time.time()
+
+
+class PlaybackQueue:
+    """Audio waiting to be played in guild.
+
+    Queued audio is encoded in background while current item plays.
+    """
+
+    def __init__(self, vc, max_depth=MAX_QUEUE_DEPTH):
+        self.vc = vc
+        self.max_depth = max_depth
+
+        self.items = deque()
+        self.current = None
+
+        self._skipping = False
+
+        self.played = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.total_wait = 0
+
+    def add(self, audio, title=None):
+        if self.current is None and not self.vc.is_playing():
+            try:
+                self._play(QueueItem(audio, title))
+            except Exception:
+                audio.cleanup()
+
+                raise
+
+            return 0
+
+        if len(self.items) >= self.max_depth:
+            self.dropped += 1
+            audio.cleanup()
+
+            raise QueueFull(self.max_depth)
+
+        audio = PreEncodedAudio(audio)
+        self.vc.loop.run_in_executor(_encode_executor, audio.encode)
+
+        self.items.append(QueueItem(audio, title))
+
+        return len(self.items)
+
+    def _play(self, item):
+        # current is set only after playback started, otherwise queue would
+        # wait for after callback which is never called
+        self.vc.play(item.audio, after=self._after)
+
+        self.current = item
+        self._skipping = False
+        self.total_wait += time.time() - item.queued_at
+
+    def _after(self, error):
+        # called from player thread
+        self.vc.loop.call_soon_threadsafe(self._play_next)
+
+    def _play_next(self):
+        self.current = None
+        if self._skipping:
+            self._skipping = False
+        else:
+            self.played += 1
+
+        if not self.items:
+            return
+
+        if not self.vc.is_connected():
+            self.clear()
+            # queue could be replaced after reconnect
+            if _queues.get(self.vc.guild.id) is self:
+                del _queues[self.vc.guild.id]
+
+            return
+
+        while self.items:
+            item = self.items.popleft()
+            try:
+                return self._play(item)
+            except Exception:
+                self.dropped += 1
+                item.audio.cleanup()
+
+    def skip(self):
+        if self.current is None:
+            return False
+
+        self.skipped += 1
+        self._skipping = True
+        # next item is started by after callback
+        self.vc.stop()
+
+        return True
+
+    def clear(self):
+        count = len(self.items)
+        for item in self.items:
+            item.audio.cleanup()
+
+        self.items.clear()
+
+        return count
+
+    def get_stats(self):
+        started = self.played + self.skipped + (self.current is not None)
+
+        return {
+            'queued': len(self.items),
+            'played': self.played,
+            'skipped': self.skipped,
+            'dropped': self.dropped,
+            'average_wait': self.total_wait / started if started else 0,
+        }
+
+
+class PreEncodedAudio(AudioSource):
+    """Reads source to opus frames in background thread using encode method,
+    frames are played as soon as they are available.
+
+    If background encoding did not start or fell behind, player reads next
+    frame from source itself instead of waiting for executor.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+        self._frames = []
+        self._position = 0
+        self._done = False
+        self._encoder = None
+        # source is read by one thread at a time
+        self._reading = False
+        self._condition = threading.Condition()
+
+    def _read_frame(self):
+        # called with condition acquired, it is released while source is read
+        self._reading = True
+        self._condition.release()
+        try:
+            data = self.source.read()
+            if data and not self.source.is_opus():
+                if self._encoder is None:
+                    self._encoder = Encoder()
+
+                data = self._encoder.encode(data, Encoder.SAMPLES_PER_FRAME)
+        except Exception:
+            data = b''
+        finally:
+            self._condition.acquire()
+            self._reading = False
+
+        if data:
+            self._frames.append(data)
+        else:
+            self._done = True
+
+        self._condition.notify_all()
+
+    def encode(self):
+        with self._condition:
+            while not self._done:
+                if self._reading:
+                    self._condition.wait()
+                else:
+                    self._read_frame()
+
+    def read(self):
+        with self._condition:
+            while self._position >= len(self._frames) and not self._done:
+                if self._reading:
+                    # frame is being read by encoder, takes one frame time
+                    self._condition.wait()
+                else:
+                    self._read_frame()
+
+            if self._position >= len(self._frames):
+                return b''
+
+            frame = self._frames[self._position]
+            # played frames are not needed anymore
+            self._frames[self._position] = None
+            self._position += 1
+
+            return frame
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        with self._condition:
+            self._done = True
+            self._condition.notify_all()
+
+        self.source.cleanup()
+
+
+class OpusFramesAudio(AudioSource):
+    """Plays opus frames encoded in advance"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self._iter = iter(frames)
+
+    def read(self):
+        return next(self._iter, b'')
+
+    def is_opus(self):
+        return True
+
+
+class OpusEncodingAudio(AudioSource):
+    """Encodes pcm source to opus while it is played.
+
+    Callback is called from player thread with list of encoded frames after
+    source is read to the end, it is not called if playback is stopped,
+    encoded audio exceeds max_size bytes or discard was called.
+    """
+
+    def __init__(self, source, callback, max_size=None):
+        self.source = source
+
+        self._callback = callback
+        self._max_size = max_size
+        self._encoder = None
+
+        self._frames = []
+        self._size = 0
+
+    def read(self):
+        pcm = self.source.read()
+        if not pcm:
+            if self._frames is not None:
+                frames, self._frames = self._frames, None
+                self._callback(frames)
+
+            return b''
+
+        if self._encoder is None:
+            self._encoder = Encoder()
+
+        frame = self._encoder.encode(pcm, Encoder.SAMPLES_PER_FRAME)
+
+        if self._frames is not None:
+            self._frames.append(frame)
+            self._size += len(frame)
+            if self._max_size is not None and self._size > self._max_size:
+                self._frames = None
+
+        return frame
+
+    def discard(self):
+        """Drops encoded frames, used when source is known to be incomplete"""
+
+        self._frames = None
+
+    def is_opus(self):
+        return True
 
-    vc.play(audio)
+    def cleanup(self):
+        self.source.cleanup()